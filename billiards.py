@@ -6,7 +6,7 @@ from pathlib import Path
 from billiards.data_manager import DataManager
 from billiards.graphics.mpl import GraphicsMatPlotLib
 from billiards.core.geometry import ComposedPath
-from billiards.numeric_methods import DEFAULT_METHOD
+from billiards.numeric_methods import BATCH_METHODS, DEFAULT_METHOD
 from billiards.utils.misc import flat_array, parse_conditions
 from billiards.utils.iterator import iterate_parallel, iterate_serial
 from billiards.utils.time import sharedTimer
@@ -50,8 +50,16 @@ def load_simulation_variables(path: str):
     else:
         simulationVars["threads"] = 2
 
+    if "executor" in params:
+        simulationVars["executor"] = params["executor"]
+    else:
+        simulationVars["executor"] = "processes"
+
     if "method" in params:
         simulationVars["method"] = params["method"]
+    elif simulationVars["executor"] == "threads":
+        # The threads only run batched methods
+        simulationVars["method"] = BATCH_METHODS[0]
     else:
         simulationVars["method"] = DEFAULT_METHOD
 
@@ -88,8 +96,10 @@ if __name__ == "__main__":
             simulationVars["billiard"],
             simulationVars["iterations"],
             simulationVars["threads"],
-            method=simulationVars["method"]
+            method=simulationVars["method"],
+            executor=simulationVars["executor"]
         )
+        simulationVars["billiard"].close_executor()
         sharedTimer.end_operation("iterate_parallel", idTimer)
     else:
         print("Executing serial")
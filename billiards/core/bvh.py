@@ -0,0 +1,167 @@
+from heapq import heappop, heappush
+from math import inf
+
+
+class PolylineBVH:
+    '''Bounding volume hierarchy of axis aligned boxes over the segments of
+    a polyline, to find the segments crossed by a ray nearest first.
+
+    ts, xs, ys: Parameters and coordinates of the vertices, in order.
+    validSegments: Whether each pair of consecutive vertices is a segment of
+    the polyline (pairs of different components are not).
+    leafSize: Maximum number of segments in a leaf.
+    '''
+
+    def __init__(self, ts, xs, ys, validSegments, leafSize=8):
+        self.ts = list(ts)
+        self.xs = list(xs)
+        self.ys = list(ys)
+        self.leafSize = leafSize
+
+        segments = [
+            index for index, valid in enumerate(validSegments) if valid
+        ]
+
+        # Nodes, as parallel lists. Leaves have no children and keep the
+        # range of their segments in self.segments.
+        self.boxes = []
+        self.children = []
+        self.ranges = []
+        self.segments = []
+        if len(segments) > 0:
+            self.build(segments)
+
+    def build(self, segments):
+        xs = self.xs
+        ys = self.ys
+        nodeIndex = len(self.boxes)
+        self.boxes.append((
+            min(min(xs[i], xs[i + 1]) for i in segments),
+            min(min(ys[i], ys[i + 1]) for i in segments),
+            max(max(xs[i], xs[i + 1]) for i in segments),
+            max(max(ys[i], ys[i + 1]) for i in segments)
+        ))
+        self.children.append(None)
+        self.ranges.append(None)
+
+        if len(segments) <= self.leafSize:
+            self.ranges[nodeIndex] = (
+                len(self.segments), len(self.segments) + len(segments)
+            )
+            self.segments.extend(segments)
+            return nodeIndex
+
+        # Split at the median of the segments' centers, along the longest
+        # side of the box
+        minX, minY, maxX, maxY = self.boxes[nodeIndex]
+        if maxX - minX >= maxY - minY:
+            def key(i): return xs[i] + xs[i + 1]
+        else:
+            def key(i): return ys[i] + ys[i + 1]
+
+        segments = sorted(segments, key=key)
+        middle = len(segments) // 2
+        left = self.build(segments[:middle])
+        right = self.build(segments[middle:])
+        self.children[nodeIndex] = (left, right)
+
+        return nodeIndex
+
+    def make_entry_distance(self, x0, y0, dx, dy):
+        '''Returns the function giving the distance along the ray (in units
+        of its direction) where it enters a node's box, or None if it misses
+        the box.
+        '''
+        boxes = self.boxes
+        inverseX = 1 / dx if dx != 0 else None
+        inverseY = 1 / dy if dy != 0 else None
+
+        def entry_distance(node):
+            minX, minY, maxX, maxY = boxes[node]
+
+            if inverseX is None:
+                if x0 < minX or x0 > maxX:
+                    return None
+                near, far = 0.0, inf
+            else:
+                near = (minX - x0) * inverseX
+                far = (maxX - x0) * inverseX
+                if near > far:
+                    near, far = far, near
+                if near < 0.0:
+                    near = 0.0
+
+            if inverseY is None:
+                if y0 < minY or y0 > maxY:
+                    return None
+            else:
+                low = (minY - y0) * inverseY
+                high = (maxY - y0) * inverseY
+                if low > high:
+                    low, high = high, low
+                if low > near:
+                    near = low
+                if high < far:
+                    far = high
+
+            return near if near <= far else None
+
+        return entry_distance
+
+    def crossings(self, x0, y0, dx, dy, exclude=()):
+        '''Yields (estimate, segment) for the segments whose vertices are on
+        opposite sides of the line of the ray, in increasing order of
+        estimate, the distance along the ray to its hit on the segment.
+        Hits behind the ray's origin are skipped.
+
+        exclude: Segments to skip.
+        '''
+        if len(self.boxes) == 0:
+            return
+
+        xs = self.xs
+        ys = self.ys
+        offset = y0 * dx - x0 * dy
+        entry_distance = self.make_entry_distance(x0, y0, dx, dy)
+        heap = []
+        entry = entry_distance(0)
+        if entry is not None:
+            heap.append((entry, 0, 0))
+
+        while len(heap) > 0:
+            distance, isSegment, item = heappop(heap)
+            if isSegment:
+                yield distance, item
+                continue
+
+            children = self.children[item]
+            if children is not None:
+                for child in children:
+                    entry = entry_distance(child)
+                    if entry is not None:
+                        heappush(heap, (entry, 0, child))
+                continue
+
+            start, end = self.ranges[item]
+            for segment in self.segments[start:end]:
+                if segment in exclude:
+                    continue
+
+                startX, endX = xs[segment], xs[segment + 1]
+                startY, endY = ys[segment], ys[segment + 1]
+                startSide = startY * dx - startX * dy - offset
+                endSide = endY * dx - endX * dy - offset
+                if startSide * endSide > 0 or startSide == endSide == 0:
+                    continue
+
+                chordX = endX - startX
+                chordY = endY - startY
+                denominator = dx * chordY - dy * chordX
+                if denominator == 0:
+                    continue
+
+                estimate = (
+                    (startX - x0) * chordY - (startY - y0) * chordX
+                ) / denominator
+                if estimate >= 0:
+                    heappush(heap, (estimate, 1, segment))
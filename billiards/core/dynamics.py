@@ -1,74 +1,242 @@
-from math import acos, asin, cos, pi, sin
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, wait
+from math import acos, asin, ceil, cos, pi, sin
+from threading import Lock
 from typing import Callable, List, Optional, Tuple
 
-from multiprocess import Pool
+from multiprocess import Pool, TimeoutError, Value, resource_tracker
+from multiprocess.shared_memory import SharedMemory
+from numpy import (arctan2, array, cos as np_cos, empty, float64, ndarray,
+                   prod, sin as np_sin, where)
 from pandas import DataFrame
 
+from billiards.core.bvh import PolylineBVH
 from billiards.core.geometry import ComposedPath
-from billiards.numeric_methods import find_zero
+from billiards.core.polygon import (PolygonalBilliard,
+                                    make_polygonal_billiard)
+from billiards.core.primitives import detect_primitive
+from billiards.core.surrogate import component_from_compiled
+from billiards.exceptions import BracketException
+from billiards.numeric_methods import (BATCH_METHODS, DEFAULT_METHOD,
+                                       SECOND_ORDER_METHODS, find_zero)
 from billiards.utils.time import sharedTimer as timer
 
+# Boundary, state map and progress counter of a worker process of
+# SimulationExecutor, set by initialize_worker
+WORKER = {}
+
+
+class SharedColumns(ndarray):
+    '''Array over a shared memory block that keeps the block open.
+
+    The views of the array (and their views, and so on) hold a reference
+    to it, so the block is only closed, and its memory unmapped, when no
+    array using it is left, whatever happens to the orbits and the
+    executor that made it.
+    '''
+    block: SharedMemory
+
+
+def make_shared_columns(shape: Tuple[int, ...]):
+    '''Returns a new shared memory block and a float array of the given
+    shape over it, which keeps it open (see SharedColumns).
+    '''
+    block = SharedMemory(
+        create=True, size=int(prod(shape)) * float64().itemsize
+    )
+    shared = SharedColumns(shape, dtype=float64, buffer=block.buf)
+    shared.block = block
+
+    return block, shared.view(ndarray)
+
 
 class Orbit:
+    '''Iterates of an initial condition, stored as the columns t, theta, x
+    and y of a preallocated array that grows geometrically, so adding a
+    point takes constant time. The points property builds the DataFrame of
+    the iterates on access.
+
+    The orbit is iterated by the state map of the boundary (see
+    make_billiard_map), keeping the state of the current condition.
+    '''
     initialCondition: Tuple[float, float]
     currentCondition: Tuple[float, float]
-    points: DataFrame
-    billiardMap: Callable[
-        [Tuple[float, float], Optional[str]],
-        Tuple[Tuple[float, float], Tuple[float, float]]
+    currentState: Tuple[float, float, float, float, float, float]
+    columns: ndarray
+    size: int
+    stateMap: Callable[
+        [Tuple[float, float, float, float, float, float], Optional[str]],
+        Tuple[float, float, float, float, float, float]
     ]
 
+    COLUMNS = ["t", "theta", "x", "y"]
+    INITIAL_CAPACITY = 16
+
+    # Iterations between progress reports in iterate_n
+    CHUNK_SIZE = 1000
+
     def __init__(
         self,
         boundary: ComposedPath,
         points: DataFrame = None,
-        initialCondition: Tuple[float, float] = None
+        initialCondition: Tuple[float, float] = None,
+        stateMap: Callable = None
     ):
+        '''stateMap: The boundary's state map, if already built (see
+        make_billiard_map), so orbits on the same boundary can share it.
+        '''
 
-        self.billiardMap = make_billiard_map(boundary)
+        if stateMap is None:
+            stateMap = make_billiard_map(boundary, state=True)
+        self.boundary = boundary
+        self.stateMap = stateMap
+        self.currentState = None
+        self.pointsCache = None
         if points is not None:
             # Todo: Check if points have the right format
+            self.columns = points[Orbit.COLUMNS].to_numpy(dtype=float).T.copy()
+            self.size = self.columns.shape[1]
             self.initialCondition = (
-                points.loc[0]["t"],
-                points.loc[0]["theta"]
+                float(self.columns[0, 0]), float(self.columns[1, 0])
             )
             self.currentCondition = (
-                points.loc[len(points.index) - 1]["t"],
-                points.loc[len(points.index) - 1]["theta"]
+                float(self.columns[0, -1]), float(self.columns[1, -1])
             )
-            self.points = points
         elif initialCondition is not None:
             self.initialCondition = initialCondition
             self.currentCondition = initialCondition
             initialPoint = boundary.get_point(
                 initialCondition[0], evaluate=True
             )
-            self.points = DataFrame([{
-                "t": initialCondition[0],
-                "theta": initialCondition[1],
-                "x": initialPoint[0],
-                "y": initialPoint[1]
-            }])
+            self.columns = empty((len(Orbit.COLUMNS), Orbit.INITIAL_CAPACITY))
+            self.columns[:, 0] = (*initialCondition, *initialPoint)
+            self.size = 1
         else:
             raise Exception(
                 "Dataframe with iterates or initial condition" +
                 "needed to create the orbit."
             )
 
+    @property
+    def points(self) -> DataFrame:
+        '''DataFrame with the columns t, theta, x and y of the iterates,
+        a view of the orbit's columns. It is rebuilt only after new points
+        are added. When the columns are in a shared memory block, the
+        view keeps the block open (see SharedColumns).
+        '''
+        if self.pointsCache is None or len(self.pointsCache) != self.size:
+            self.pointsCache = DataFrame(
+                self.columns[:, :self.size].T,
+                columns=Orbit.COLUMNS,
+                copy=False
+            )
+
+        return self.pointsCache
+
+    def reserve(self, size: int):
+        '''Grows the columns to hold at least size points.'''
+        capacity = self.columns.shape[1]
+        if size <= capacity:
+            return
+
+        columns = empty((len(Orbit.COLUMNS), max(size, 2 * capacity)))
+        columns[:, :self.size] = self.columns[:, :self.size]
+        self.wrap(columns)
+
+    def wrap(self, columns: ndarray):
+        '''Replaces the columns by the given array, which must hold the
+        orbit's points in its first size columns.
+        '''
+        self.columns = columns
+        self.pointsCache = None
+
+    def get_state(self):
+        '''Returns the state (phi, theta, x, y, dx, dy) of the current
+        condition, evaluating the boundary only if it isn't known.
+        '''
+        if self.currentState is None:
+            phi, theta = self.currentCondition
+            self.currentState = (
+                phi, theta, *self.boundary.get_frame(phi, evaluate=True)
+            )
+
+        return self.currentState
+
     def iterate(self, method=None):
         id = timer.start_operation("iterateOrbit")
-        nextCondition, nextPoint = self.billiardMap(
-            self.currentCondition, method=method
-        )
-        newRow = [
+        state = self.stateMap(self.get_state(), method=method)
+        self.add_point(state[:2], state[2:4])
+        self.currentState = state
+        timer.end_operation("iterateOrbit", id)
+
+    def iterate_n(self, iterations, method=None, callback=None):
+        '''Computes the next iterations in a single loop, writing them
+        directly to the columns. Timing and progress are reported once per
+        chunk of CHUNK_SIZE iterations instead of once per iteration.
+
+        callback: Called after each chunk with its number of iterations.
+        '''
+        self.reserve(self.size + iterations)
+
+        state = self.get_state()
+        remaining = iterations
+        while remaining > 0:
+            chunk = min(remaining, Orbit.CHUNK_SIZE)
+            idChunk = timer.start_operation("iterate_chunk")
+
+            state = iterate_states(
+                self.stateMap, state, self.columns,
+                self.size, self.size + chunk, method
+            )
+
+            self.size += chunk
+            self.currentCondition = state[:2]
+            self.currentState = state
+            remaining -= chunk
+            timer.end_operation("iterate_chunk", idChunk)
+
+            if callback is not None:
+                callback(chunk)
+
+    def add_point(
+        self,
+        nextCondition: Tuple[float, float],
+        nextPoint: Tuple[float, float]
+    ):
+        if self.size == self.columns.shape[1]:
+            self.reserve(self.size + 1)
+
+        self.columns[:, self.size] = (
             nextCondition[0],
             nextCondition[1],
             nextPoint[0],
             nextPoint[1]
-        ]
-        self.points.loc[len(self.points.index)] = newRow
-        self.currentCondition = nextCondition
-        timer.end_operation("iterateOrbit", id)
+        )
+        self.size += 1
+        self.currentCondition = tuple(nextCondition)
+        self.currentState = None
+
+
+def iterate_states(stateMap, state, columns, start, stop, method=None):
+    '''Iterates the state with the state map (see make_billiard_map),
+    writing the conditions and points of the iterates to the columns
+    start to stop of columns. Returns the last state.
+
+    The maps of polygonal boundaries are iterated by their engine's own
+    loop (see PolygonalBilliard.iterate_states).
+    '''
+    engine = getattr(stateMap, "__self__", None)
+    if isinstance(engine, PolygonalBilliard):
+        return engine.iterate_states(state, columns, start, stop)
+
+    for index in range(start, stop):
+        state = stateMap(state, method=method)
+        columns[0, index] = state[0]
+        columns[1, index] = state[1]
+        columns[2, index] = state[2]
+        columns[3, index] = state[3]
+
+    return state
 
 
 class Billiard:
@@ -79,34 +247,57 @@ class Billiard:
         self,
         boundary: ComposedPath,
         initialConditions: List[Tuple[float, float]] = [],
-        orbits: List[Orbit] = None
+        orbits: List[Orbit] = None,
+        stateMap: Callable = None
     ):
+        '''stateMap: The boundary's state map, if already built (e.g. the
+        one shared by the given orbits), so it isn't built again.
+        '''
 
         self.boundary = boundary
+        self.stateMap = stateMap
+        self.executor = None
         if orbits is not None:
             self.orbits = orbits
         else:
             self.orbits = []
 
-        for condition in initialConditions:
-            t = condition[0]
-            self.orbits.append(Orbit(
-                boundary,
-                initialCondition=condition,
-                initialPoint=boundary.get_point(t, evaluate=True)
-            ))
+        self.add_orbits(initialConditions)
+
+    def get_state_map(self):
+        '''Returns the state map shared by the orbits added to the
+        billiard, built on first use.
+        '''
+        if self.stateMap is None:
+            self.stateMap = make_billiard_map(self.boundary, state=True)
+
+        return self.stateMap
 
     def iterate(
         self,
         indexes: List[int] = None,
         callback=None,
         iterations=1,
-        method: str = None
+        method: str = None,
+        batch: bool = False
     ):
+        '''Iterates the given orbits (all by default).
+
+        callback: Called after each iteration.
+        batch: Whether to compute each orbit's iterations in a single loop
+        (see Orbit.iterate_n), with the callback called after each chunk of
+        iterations with their number.
+        '''
         if indexes is None:
             indexes = range(self.orbits.__len__())
 
+        if batch:
+            for index in indexes:
+                self.orbits[index].iterate_n(iterations, method, callback)
+            return
+
         for index in indexes:
+            self.orbits[index].reserve(self.orbits[index].size + iterations)
             for _ in range(iterations):
                 idMap = timer.start_operation("iterate_orbit")
                 self.orbits[index].iterate(method=method)
@@ -115,6 +306,42 @@ class Billiard:
                 if callback is not None:
                     callback()
 
+    def iterate_vectorized(
+        self,
+        indexes: List[int] = None,
+        callback=None,
+        iterations=1,
+        method: str = None
+    ):
+        '''Iterates the orbits together, with the whole ensemble advanced
+        at each step by a batched billiard map.
+
+        callback: Called once per orbit at each step, as in iterate.
+        '''
+        if indexes is None:
+            indexes = range(self.orbits.__len__())
+        if len(indexes) == 0:
+            return
+
+        batchMap = make_batch_billiard_map(self.boundary)
+        orbits = [self.orbits[index] for index in indexes]
+        for orbit in orbits:
+            orbit.reserve(orbit.size + iterations)
+        phi = array([orbit.currentCondition[0] for orbit in orbits])
+        theta = array([orbit.currentCondition[1] for orbit in orbits])
+
+        for _ in range(iterations):
+            idMap = timer.start_operation("iterate_ensemble")
+            phi, theta, x, y = batchMap(phi, theta, method=method)
+            rows = zip(phi.tolist(), theta.tolist(), x.tolist(), y.tolist())
+            for orbit, (phi1, theta1, x1, y1) in zip(orbits, rows):
+                orbit.add_point((phi1, theta1), (x1, y1))
+            timer.end_operation("iterate_ensemble", idMap)
+
+            if callback is not None:
+                for _ in orbits:
+                    callback()
+
     def iterate_parallel(
         self,
         callback=None,
@@ -122,29 +349,122 @@ class Billiard:
         poolSize=2,
         method: str = None
     ):
+        '''Iterates the orbits on the billiard's executor (see
+        get_executor), which is kept for the next calls.
 
-        def iterateOrbit(orbit: Orbit):
-            for _ in range(iterations):
-                idMap = timer.start_operation("iterate_orbit")
-                orbit.iterate(method=method)
-                timer.end_operation("iterate_orbit", idMap)
+        callback: Called with the number of iterations done since its last
+        call (see SimulationExecutor.iterate).
+        '''
+        self.get_executor(poolSize).iterate(
+            self.orbits, iterations, method, callback
+        )
 
-                if callback is not None:
-                    callback()
+    def iterate_threaded(
+        self,
+        callback=None,
+        iterations=1,
+        threads=2,
+        method: str = None
+    ):
+        '''Iterates the orbits on a pool of threads, with no processes to
+        start or data to copy. The orbits are split in a tile per thread,
+        each advanced at every step by the batched billiard map (see
+        make_batch_billiard_map), whose NumPy evaluation releases the GIL.
+        So, as that map, it only handles convex boundaries.
+
+        method: A method in BATCH_METHODS, the first one by default.
+        callback: Called with the number of iterations done since its last
+        call, on the calling thread.
+        '''
+        orbits = self.orbits
+        if len(orbits) == 0 or iterations <= 0:
+            return
+
+        method = check_batch_method(method)
+        batchMap = make_batch_billiard_map(self.boundary)
+        for orbit in orbits:
+            orbit.reserve(orbit.size + iterations)
+
+        tileSize = ceil(len(orbits) / threads)
+        tiles = [
+            orbits[start:start + tileSize]
+            for start in range(0, len(orbits), tileSize)
+        ]
+
+        progress = [0]
+        progressLock = Lock()
+
+        def iterateTile(tile: List[Orbit]):
+            phi = array([orbit.currentCondition[0] for orbit in tile])
+            theta = array([orbit.currentCondition[1] for orbit in tile])
+
+            points = empty((len(Orbit.COLUMNS), len(tile), iterations))
+            for step in range(iterations):
+                phi, theta, x, y = batchMap(phi, theta, method=method)
+                points[0, :, step] = phi
+                points[1, :, step] = theta
+                points[2, :, step] = x
+                points[3, :, step] = y
+
+                with progressLock:
+                    progress[0] += len(tile)
+
+            for index, orbit in enumerate(tile):
+                orbit.columns[:, orbit.size:orbit.size + iterations] = \
+                    points[:, index]
+                orbit.size += iterations
+                orbit.currentCondition = (
+                    float(phi[index]), float(theta[index])
+                )
+                orbit.currentState = None
 
-            return orbit
+        with ThreadPoolExecutor(threads) as executor:
+            futures = [executor.submit(iterateTile, tile) for tile in tiles]
 
-        pool = Pool(poolSize)
+            pending = futures
+            reported = 0
+            while len(pending) > 0:
+                _, pending = wait(
+                    pending, timeout=SimulationExecutor.REPORT_INTERVAL
+                )
 
-        res = pool.map(iterateOrbit, self.orbits)
+                done = progress[0]
+                if callback is not None and done > reported:
+                    callback(done - reported)
+                    reported = done
 
-        for index in range(len(res)):
-            self.orbits[index] = res[index]
+            for future in futures:
+                future.result()
+
+    def get_executor(self, poolSize=2):
+        '''Returns the billiard's SimulationExecutor, started on first use
+        and kept until close_executor is called. It is restarted if the
+        pool size or the boundary changes.
+        '''
+        executor = self.executor
+        if executor is not None and (
+            executor.poolSize != poolSize or
+            executor.boundary is not self.boundary
+        ):
+            self.close_executor()
+            executor = None
+
+        if executor is None:
+            executor = SimulationExecutor(self.boundary, poolSize)
+            self.executor = executor
+
+        return executor
+
+    def close_executor(self):
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
 
     def add_orbit(self, initialCondition: Tuple[float, float]):
         newOrbit = Orbit(
             self.boundary,
-            initialCondition=initialCondition
+            initialCondition=initialCondition,
+            stateMap=self.get_state_map()
         )
         self.orbits.append(newOrbit)
 
@@ -153,49 +473,521 @@ class Billiard:
         for ic in initialCondition:
             newOrbit = Orbit(
                 self.boundary,
-                initialCondition=ic
+                initialCondition=ic,
+                stateMap=self.get_state_map()
             )
             self.orbits.append(newOrbit)
 
     def remove_orbit(self, index):
         return self.orbits.pop(index)
 
+    def sweep(
+        self,
+        parameterValues: List[dict],
+        callback=None,
+        iterations=1,
+        method: str = DEFAULT_METHOD
+    ):
+        '''Iterates the initial conditions of the billiard's orbits on the
+        members of the boundary's family with each of the given parameter
+        values (see ComposedPath.with_parameters). The members share the
+        boundary's compiled kernels, so only the iterations are computed
+        for each value.
+
+        Returns the billiards of the members, in the order of the values.
+
+        callback: Called once per orbit at each step, as in iterate.
+        '''
+        initialConditions = [orbit.initialCondition for orbit in self.orbits]
+
+        billiards = []
+        for values in parameterValues:
+            billiard = Billiard(
+                self.boundary.with_parameters(values), initialConditions
+            )
+
+            # Batched methods advance all the orbits together
+            iterate = billiard.iterate_vectorized \
+                if method in BATCH_METHODS else billiard.iterate
+            iterate(callback=callback, iterations=iterations, method=method)
+
+            billiards.append(billiard)
+
+        return billiards
+
+
+class SimulationExecutor:
+    '''Pool of worker processes that iterate orbits on a boundary, kept
+    alive between calls to iterate. Use it as a context manager or call
+    close when done.
+
+    The workers receive the boundary's compiled components once, when they
+    start (see initialize_worker), and build the state map locally. Each
+    task sends only the current condition of an orbit, and the workers
+    write the new iterates directly to a shared memory block with the
+    columns of all the orbits, of which the orbits then keep views. The
+    tasks are scheduled dynamically, in chunks sized by the work they
+    represent, so slow orbits don't hold the others back.
+
+    The workers add their iterations to a shared counter every
+    PROGRESS_CHUNK iterations, and the progress is reported from the
+    calling thread, as the orbits are done or every REPORT_INTERVAL
+    seconds.
+    '''
+
+    # Target number of iterations per chunk of tasks
+    CHUNK_ITERATIONS = 2000
+
+    # Minimum number of chunks per worker, for load balancing
+    CHUNKS_PER_WORKER = 4
+
+    # Iterations between updates of the progress counter by the workers
+    PROGRESS_CHUNK = 100
+
+    # Maximum time, in seconds, between progress reports
+    REPORT_INTERVAL = .1
+
+    def __init__(self, boundary: ComposedPath, poolSize=2):
+        self.boundary = boundary
+        self.poolSize = poolSize
+
+        compiledPaths = [
+            path.to_compiled() for path in boundary.componentPaths
+        ]
+
+        # The workers must share the resource tracker of this process.
+        # Otherwise their own trackers unlink the shared memory blocks
+        # they attach to when they exit.
+        resource_tracker.ensure_running()
+        self.progress = Value("q", 0)
+        self.pool = Pool(
+            poolSize,
+            initializer=initialize_worker,
+            initargs=(compiledPaths, boundary.periodic, self.progress)
+        )
+
+        # Shared memory block of the last iterated orbits and their views
+        self.block = None
+        self.views = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def chunk_size(self, taskCount: int, iterations: int):
+        '''Tasks per chunk: enough to amortize the communication for short
+        runs, but at least CHUNKS_PER_WORKER chunks for each worker.
+        '''
+        byWork = SimulationExecutor.CHUNK_ITERATIONS // max(iterations, 1)
+        byBalance = taskCount // \
+            (self.poolSize * SimulationExecutor.CHUNKS_PER_WORKER)
+
+        return max(1, min(byWork, byBalance))
+
+    def iterate(
+        self,
+        orbits: List[Orbit],
+        iterations: int,
+        method: str = None,
+        callback=None
+    ):
+        '''Appends the next iterations to the orbits.
+
+        callback: Called with the number of iterations done since the last
+        call, on the calling thread, so it can update a GUI.
+        '''
+        if len(orbits) == 0 or iterations <= 0:
+            return
+
+        with self.progress.get_lock():
+            self.progress.value = 0
+
+        self.share(orbits, max(orbit.size for orbit in orbits) + iterations)
+        shape = (len(orbits), len(Orbit.COLUMNS), self.views[0].shape[1])
+
+        tasks = [
+            (
+                index, orbit.currentCondition, iterations, method,
+                self.block.name, shape, orbit.size
+            )
+            for index, orbit in enumerate(orbits)
+        ]
+        # The chunks are made here, as imap_unordered only supports a
+        # timeout when it doesn't chunk the tasks itself
+        chunkSize = self.chunk_size(len(tasks), iterations)
+        chunks = [
+            tasks[start:start + chunkSize]
+            for start in range(0, len(tasks), chunkSize)
+        ]
+        results = self.pool.imap_unordered(iterate_worker, chunks)
+
+        pending = len(chunks)
+        reported = 0
+        while pending > 0:
+            try:
+                indexes = results.next(SimulationExecutor.REPORT_INTERVAL)
+            except TimeoutError:
+                indexes = []
+            else:
+                pending -= 1
+
+            for index in indexes:
+                orbit = orbits[index]
+                orbit.size += iterations
+                orbit.currentCondition = (
+                    float(orbit.columns[0, orbit.size - 1]),
+                    float(orbit.columns[1, orbit.size - 1])
+                )
+                orbit.currentState = None
+
+            done = self.progress.value
+            if callback is not None and done > reported:
+                callback(done - reported)
+                reported = done
 
-def get_objective_function(boundary: ComposedPath, phi0: float, theta0: float):
+    def share(self, orbits: List[Orbit], size: int):
+        '''Makes the orbits' columns views of a shared memory block with
+        room for size points per orbit. The current block is kept if it
+        already holds the orbits, and otherwise a new one is created, twice
+        as large as the longest orbit, and the orbits' points are moved to
+        it.
+        '''
+        if (
+            len(self.views) == len(orbits) and
+            size <= self.views[0].shape[1] and
+            all(
+                orbit.columns is view
+                for orbit, view in zip(orbits, self.views)
+            )
+        ):
+            return
+
+        capacity = max(size, 2 * max(orbit.size for orbit in orbits))
+        block, columns = make_shared_columns(
+            (len(orbits), len(Orbit.COLUMNS), capacity)
+        )
+
+        self.release()
+        self.block = block
+        self.views = list(columns)
+        for orbit, view in zip(orbits, self.views):
+            view[:, :orbit.size] = orbit.columns[:, :orbit.size]
+            orbit.wrap(view)
+
+    def release(self):
+        '''Unlinks the current shared memory block. It is closed, and its
+        memory freed, when no array views it (see SharedColumns).
+        '''
+        if self.block is not None:
+            self.block.unlink()
+            self.block = None
+            self.views = []
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.release()
+
+
+def initialize_worker(compiledPaths, periodic, progress):
+    '''Rebuilds, on a worker process, the boundary from its compiled
+    components (see SimplePath.to_compiled and ChebyshevPath.to_compiled)
+    and its state map.
+
+    progress: Shared counter of the iterations done.
+    '''
+    boundary = ComposedPath(
+        [component_from_compiled(path) for path in compiledPaths],
+        periodic=periodic
+    )
+
+    WORKER["boundary"] = boundary
+    WORKER["stateMap"] = make_billiard_map(boundary, state=True)
+    WORKER["progress"] = progress
+
+
+def iterate_worker(tasks):
+    '''Iterates a chunk of conditions on a worker process. Each task has
+    the index of the orbit, its condition, the number of iterations, the
+    method, and the name and shape of the shared memory block (see
+    SimulationExecutor) and the column where the iterates start. Returns
+    the indexes.
+    '''
+    progress = WORKER["progress"]
+    chunk = SimulationExecutor.PROGRESS_CHUNK
+
+    indexes = []
+    for task in tasks:
+        index, condition, iterations, method, blockName, shape, start = task
+        phi, theta = condition
+        state = (
+            phi, theta, *WORKER["boundary"].get_frame(phi, evaluate=True)
+        )
+
+        block = SharedMemory(name=blockName)
+        columns = ndarray(shape, dtype=float64, buffer=block.buf)
+        try:
+            stop = start + iterations
+            for chunkStart in range(start, stop, chunk):
+                chunkStop = min(chunkStart + chunk, stop)
+                state = iterate_states(
+                    WORKER["stateMap"], state, columns[index],
+                    chunkStart, chunkStop, method
+                )
+
+                with progress.get_lock():
+                    progress.value += chunkStop - chunkStart
+        finally:
+            # The block can only be closed without views of it
+            del columns
+            block.close()
+
+        indexes.append(index)
+
+    return indexes
+
+
+def get_objective_function(
+    boundary: ComposedPath,
+    phi0: float,
+    theta0: float,
+    secondOrder: bool = False,
+    frame: Tuple[float, float, float, float] = None
+):
     ''' Receives the billiard boundary and returns the real function
     whose root is the argument of the next point in the billiard orbit.
+
+    secondOrder: Whether the function also returns its second derivative,
+    as expected by the methods in SECOND_ORDER_METHODS.
+    frame: The point and the tangent at phi0, (x0, y0, dx0, dy0), if already
+    evaluated.
     '''
 
-    x0, y0 = boundary.get_point(phi0, evaluate=True)
-    tangent_x0, tangent_y0 = boundary.get_tangent(phi0, evaluate=True)
+    if frame is None:
+        frame = boundary.get_frame(phi0, evaluate=True)
+    x0, y0, tangent_x0, tangent_y0 = frame
+
+    # (v_x, v_y) is perpendicular to the ray
+    # (x0, y0) com inclinação theta0 com a tangente
+    v_x = -(tangent_x0) * sin(theta0) - (tangent_y0) * cos(theta0)
+    v_y = -(tangent_y0) * sin(theta0) + (tangent_x0) * cos(theta0)
 
     def func(phi: float):
-        x, y = boundary.get_point(phi, evaluate=True)
-        tangent_x, tangent_y = boundary.get_tangent(phi, evaluate=True)
+        if secondOrder:
+            x, y, drx, dry, ddrx, ddry = boundary.get_frame(
+                phi, evaluate=True, secondOrder=True
+            )
+
+            return (
+                (x - x0) * v_x + (y - y0) * v_y,
+                drx * v_x + dry * v_y,
+                ddrx * v_x + ddry * v_y
+            )
 
-        r_x = x - x0
-        r_y = y - y0
-        # (v_x, v_y) is perpendicular to the ray
-        # (x0, y0) com inclinação theta0 com a tangente
-        v_x = -(tangent_x0) * sin(theta0) - (tangent_y0) * cos(theta0)
-        v_y = -(tangent_y0) * sin(theta0) + (tangent_x0) * cos(theta0)
-        drx = tangent_x
-        dry = tangent_y
+        x, y, drx, dry = boundary.get_frame(phi, evaluate=True)
 
-        return r_x * v_x + r_y * v_y, drx * v_x + dry * v_y
+        return (x - x0) * v_x + (y - y0) * v_y, drx * v_x + dry * v_y
 
     return func
 
 
+def get_ray_direction(tangent_x0: float, tangent_y0: float, theta0: float):
+    '''Rotates the tangent by theta0, giving the direction of the ray that
+    leaves the boundary with angle theta0.
+    '''
+    return (
+        tangent_x0 * cos(theta0) - tangent_y0 * sin(theta0),
+        tangent_y0 * cos(theta0) + tangent_x0 * sin(theta0)
+    )
+
+
+def make_collision_finder(
+    boundary: ComposedPath,
+    factor: float,
+    acc: float,
+    max_iteracao: int,
+    usePrimitives=True,
+    polylineTolerance=1e-5
+):
+    '''Returns a function that finds the parameter of the next collision of
+    the ray leaving phi0 with angle theta0.
+
+    Components recognized as straight segments or elliptic arcs are hit
+    exactly by ray intersection. The remaining (general) components are
+    approximated once by a polyline, whose vertices are exact points of the
+    boundary, so the segments crossed by the ray bracket the roots of the
+    objective function. The crossed segments are found nearest first with a
+    PolylineBVH and refined with the numeric method until a hit ahead of the
+    ray is found. If there is no hit, or a bracket turns out not to bracket
+    a root (as the segments around phi0 on rays nearly tangent to the
+    boundary), the whole period is searched numerically.
+
+    The solver starts each refinement from the middle of the bracket, with
+    no warm start from the previous bounce, so the brackets only save the
+    evaluations spent narrowing the whole period (about 6 per bounce with
+    Newton, instead of 9).
+
+    polylineTolerance: Maximum distance between the polyline and the
+    boundary, relative to the boundary's size.
+    '''
+    periodo = boundary.lengthFloat
+    minDistance = factor * acc
+
+    primitives = []
+    generalComponents = []
+    for index, path in enumerate(boundary.componentPaths):
+        start = boundary.breakpointList[index]
+        primitive = detect_primitive(path) if usePrimitives else None
+        if primitive is not None:
+            primitives.append((primitive, start - path.t0Float))
+        else:
+            generalComponents.append(index)
+
+    bvh = None
+    validSegments = []
+    if len(generalComponents) > 0:
+        xMin, yMin, xMax, yMax = boundary.containing_box()
+        size = max(xMax - xMin, yMax - yMin)
+
+        vertexTs, (vertexXs, vertexYs), validSegments = boundary.poligonize(
+            polylineTolerance * size, generalComponents
+        )
+        validSegments = validSegments.tolist()
+        bvh = PolylineBVH(
+            vertexTs.tolist(), vertexXs.tolist(), vertexYs.tolist(),
+            validSegments
+        )
+
+    def find_collision_numeric(func, start, end, method):
+        return find_zero(
+            func, start, end,
+            acc=acc,
+            max_iter=max_iteracao,
+            method=method)
+
+    def find_collision_full_period(phi0, theta0, method, frame):
+        func = get_objective_function(
+            boundary, phi0, theta0, method in SECOND_ORDER_METHODS, frame
+        )
+
+        return find_collision_numeric(
+            func,
+            phi0 + factor * acc,
+            phi0 + periodo - factor * acc,
+            method)
+
+    def find_brackets(phi0, x0, y0, d_x, d_y, turn):
+        '''Yields the brackets (start, end) of the roots of the objective
+        function on the general components, nearest along the ray first.
+
+        turn: Cross product of the tangent at phi0 and the ray's direction.
+        '''
+        ts, xs, ys = bvh.ts, bvh.xs, bvh.ys
+
+        def side(index):
+            # Objective function, (point - p0) . v, where v = (-d_y, d_x) is
+            # perpendicular to the ray, on the vertex
+            return (ys[index] - y0) * d_x - (xs[index] - x0) * d_y
+
+        # Segments containing phi0 are split around it. Near phi0 the
+        # objective function is -turn * (phi - phi0).
+        own = []
+        index = bisect_right(ts, phi0) - 1
+        for segment in (index - 1, index):
+            if (
+                0 <= segment < len(validSegments) and
+                validSegments[segment] and
+                ts[segment] <= phi0 <= ts[segment + 1]
+            ):
+                own.append(segment)
+
+        for segment in own:
+            after = phi0 + factor * acc
+            if after < ts[segment + 1] and turn * side(segment + 1) > 0:
+                yield after, ts[segment + 1]
+
+            before = phi0 - factor * acc
+            if ts[segment] < before and turn * side(segment) < 0:
+                yield ts[segment] + periodo, before + periodo
+
+        for _, segment in bvh.crossings(x0, y0, d_x, d_y, own):
+            start, end = ts[segment], ts[segment + 1]
+            if end <= phi0:
+                yield start + periodo, end + periodo
+            else:
+                yield start, end
+
+    def find_collision(phi0, theta0, method, frame=None):
+        '''frame: The point and the tangent at phi0, if already evaluated.
+        '''
+        phi0 = phi0 % periodo
+        if frame is None:
+            frame = boundary.get_frame(phi0, evaluate=True)
+        x0, y0, tangent_x0, tangent_y0 = frame
+        d_x, d_y = get_ray_direction(tangent_x0, tangent_y0, theta0)
+        minS = minDistance / pow(d_x * d_x + d_y * d_y, .5)
+
+        nearestS = nearestPhi = None
+        for primitive, shift in primitives:
+            for s, t in primitive.intersect(x0, y0, d_x, d_y):
+                if s > minS and (nearestS is None or s < nearestS):
+                    nearestS = s
+                    nearestPhi = t + shift
+
+        if bvh is not None:
+            func = get_objective_function(
+                boundary, phi0, theta0, method in SECOND_ORDER_METHODS, frame
+            )
+
+            turn = tangent_x0 * d_y - tangent_y0 * d_x
+            for start, end in find_brackets(phi0, x0, y0, d_x, d_y, turn):
+                try:
+                    phi = find_collision_numeric(func, start, end, method)
+                except BracketException:
+                    return find_collision_full_period(
+                        phi0, theta0, method, frame
+                    )
+
+                x, y = boundary.get_point(phi, evaluate=True)
+                s = ((x - x0) * d_x + (y - y0) * d_y) / \
+                    (d_x * d_x + d_y * d_y)
+                if s > minS:
+                    if nearestS is None or s < nearestS:
+                        nearestS = s
+                        nearestPhi = phi
+                    break
+
+        if nearestPhi is None:
+            return find_collision_full_period(phi0, theta0, method, frame)
+
+        return nearestPhi
+
+    return find_collision
+
+
 def make_billiard_map(
     boundary: ComposedPath,
     factor=100,
+    usePrimitives=True,
+    state=False,
     **kwargs
 ):
     '''Creates the billiard map for the given boundary.
 
     factor: To be documented
 
+    usePrimitives: Whether to hit straight segments and elliptic arcs by
+    exact ray intersection instead of numeric root finding. Boundaries made
+    only of straight segments are handled by PolygonalBilliard.
+
+    state: Whether to return the map on states (phi, theta, x, y, dx, dy),
+    the condition followed by the point and the tangent at phi. The state
+    returned by a bounce carries the geometry of the next start point, so
+    it isn't evaluated again. Otherwise, the map receives the condition
+    (phi, theta) and returns the next condition and point.
+
     **kwargs: arguments for the numeric method. To be documented.
     '''
 
@@ -213,47 +1005,172 @@ def make_billiard_map(
     else:
         raise Exception("Can't simulate on non-periodic boundary")
 
-    def billiard_map(condition: Tuple[float, float], method: str = None):
-        phi0, theta0 = condition
-        func = get_objective_function(boundary, phi0, theta0)
+    if usePrimitives:
+        polygon = make_polygonal_billiard(boundary, factor * acc, acc)
+        if polygon is not None:
+            return polygon.state_map if state else polygon.billiard_map
+
+    find_collision = make_collision_finder(
+        boundary, factor, acc, max_iteracao, usePrimitives
+    )
 
-        x_phi1 = y_phi1 = None
+    def state_map(
+        state: Tuple[float, float, float, float, float, float],
+        method: str = None
+    ):
+        phi0, theta0, x_phi0, y_phi0, dx_phi0, dy_phi0 = state
+
+        # Rays tangent to the boundary stay where they are
         if ((-acc < theta0) and (theta0 < acc)):
-            theta1 = 0.0
-            phi1 = phi0
-            x_phi1, y_phi1 = boundary.get_point(phi1, evaluate=True)
+            return (phi0, 0.0, x_phi0, y_phi0, dx_phi0, dy_phi0)
         if ((pi - acc < theta0) and (theta0 < pi + acc)):
-            theta1 = pi
-            phi1 = phi0
-            x_phi1, y_phi1 = boundary.get_point(phi1, evaluate=True)
+            return (phi0, pi, x_phi0, y_phi0, dx_phi0, dy_phi0)
+
+        phi1 = find_collision(phi0, theta0, method, state[2:])
+
+        phi1 = phi1 % periodo
+
+        x_phi1, y_phi1, dx_phi1, dy_phi1 = \
+            boundary.get_frame(phi1, evaluate=True)
+
+        r_x = x_phi1 - x_phi0
+        r_y = y_phi1 - y_phi0
+        t_x = dx_phi1
+        t_y = dy_phi1
+        norma = \
+            pow(r_x * r_x + r_y * r_y, .5) * pow(t_x * t_x + t_y * t_y, .5)
+
+        if ((r_x * t_x + r_y * t_y) / norma) > 1 / 2:
+            theta1 = asin((r_x * t_y - r_y * t_x) / norma)
+        elif ((r_x * t_x + r_y * t_y) / norma) < -1 / 2:
+            theta1 = pi - asin((r_x * t_y - r_y * t_x) / norma)
         else:
-            phi1 = find_zero(
+            theta1 = acos((r_x * t_x + r_y * t_y) / norma)
+
+        return (phi1, theta1, x_phi1, y_phi1, dx_phi1, dy_phi1)
+
+    if state:
+        return state_map
+
+    def billiard_map(condition: Tuple[float, float], method: str = None):
+        phi0, theta0 = condition
+        phi1, theta1, x_phi1, y_phi1, _, _ = state_map(
+            (phi0, theta0, *boundary.get_frame(phi0, evaluate=True)), method
+        )
+
+        return ((phi1, theta1), (x_phi1, y_phi1))
+
+    return billiard_map
+
+
+def check_batch_method(method: str = None):
+    '''Returns the batched method to use for the given one, the first of
+    BATCH_METHODS if it's None. Raises if it isn't a batched method.
+    '''
+    if method is None:
+        return BATCH_METHODS[0]
+
+    if method not in BATCH_METHODS:
+        raise Exception(
+            f"Method {method} can't iterate orbits together. Use one of "
+            + f"{BATCH_METHODS}."
+        )
+
+    return method
+
+
+def get_objective_function_batch(
+    boundary: ComposedPath,
+    phi0: ndarray,
+    theta0: ndarray
+):
+    '''Vectorized get_objective_function, for arrays of conditions. The
+    returned function receives the parameters and the indexes (lanes) of
+    the conditions they refer to, as expected by the batched methods.
+    '''
+
+    x0, y0, tangent_x0, tangent_y0 = boundary.get_frames(phi0)
+    v_x = -(tangent_x0) * np_sin(theta0) - (tangent_y0) * np_cos(theta0)
+    v_y = -(tangent_y0) * np_sin(theta0) + (tangent_x0) * np_cos(theta0)
+
+    def func(phi: ndarray, lanes: ndarray):
+        x, y, tangent_x, tangent_y = boundary.get_frames(phi)
+
+        r_x = x - x0[lanes]
+        r_y = y - y0[lanes]
+
+        return (
+            r_x * v_x[lanes] + r_y * v_y[lanes],
+            tangent_x * v_x[lanes] + tangent_y * v_y[lanes]
+        )
+
+    return func
+
+
+def make_batch_billiard_map(
+    boundary: ComposedPath,
+    factor=100,
+    **kwargs
+):
+    '''Creates the billiard map for arrays of conditions, solved together
+    by a batched method (see BATCH_METHODS), the first one by default.
+
+    Each collision is searched on the whole period, where the ray has a
+    single hit only if the boundary is convex, so other boundaries are
+    refused (see ComposedPath.is_convex).
+
+    Returns a function that receives the arrays phi0 and theta0 and returns
+    the arrays phi1, theta1, x1 and y1.
+    '''
+
+    acc = kwargs.get("acc", 0.0000000000001)
+    max_iteracao = kwargs.get("max_iteracao", 100)
+
+    if boundary.periodic:
+        periodo = boundary.lengthFloat
+    else:
+        raise Exception("Can't simulate on non-periodic boundary")
+
+    if not boundary.is_convex():
+        raise Exception(
+            "The batched billiard map only handles convex boundaries."
+        )
+
+    def billiard_map(phi0: ndarray, theta0: ndarray, method: str = None):
+        method = check_batch_method(method)
+
+        phi0 = array(phi0, dtype=float) % periodo
+        theta0 = array(theta0, dtype=float)
+
+        # Rays tangent to the boundary stay where they are
+        tangentZero = (-acc < theta0) & (theta0 < acc)
+        tangentPi = (pi - acc < theta0) & (theta0 < pi + acc)
+        moving = ~(tangentZero | tangentPi)
+
+        phi1 = phi0.copy()
+        theta1 = where(tangentZero, 0.0, where(tangentPi, pi, theta0))
+
+        if moving.any():
+            start = phi0[moving]
+            func = get_objective_function_batch(
+                boundary, start, theta0[moving]
+            )
+            phi1[moving] = find_zero(
                 func,
-                phi0 + factor * acc,
-                phi0 + periodo - factor * acc,
+                start + factor * acc,
+                start + periodo - factor * acc,
                 acc=acc,
                 max_iter=max_iteracao,
-                method=method)
-
-            phi1 = phi1 % periodo
+                method=method) % periodo
 
-            x_phi1, y_phi1 = boundary.get_point(phi1, evaluate=True)
-            x_phi0, y_phi0 = boundary.get_point(phi0, evaluate=True)
-            dx_phi1, dy_phi1 = boundary.get_tangent(phi1, evaluate=True)
+            r_x, r_y = \
+                boundary.get_points(phi1[moving]) - boundary.get_points(start)
+            t_x, t_y = boundary.get_tangents(phi1[moving])
+            theta1[moving] = arctan2(r_x * t_y - r_y * t_x,
+                                     r_x * t_x + r_y * t_y)
 
-            r_x = x_phi1 - x_phi0
-            r_y = y_phi1 - y_phi0
-            t_x = dx_phi1
-            t_y = dy_phi1
-            norma = \
-                pow(r_x * r_x + r_y * r_y, .5) * pow(t_x * t_x + t_y * t_y, .5)
+        x1, y1 = boundary.get_points(phi1)
 
-            if ((r_x * t_x + r_y * t_y) / norma) > 1 / 2:
-                theta1 = asin((r_x * t_y - r_y * t_x) / norma)
-            elif ((r_x * t_x + r_y * t_y) / norma) < -1 / 2:
-                theta1 = pi - asin((r_x * t_y - r_y * t_x) / norma)
-            else:
-                theta1 = acos((r_x * t_x + r_y * t_y) / norma)
-        return ((phi1, theta1), (x_phi1, y_phi1))
+        return phi1, theta1, x1, y1
 
     return billiard_map
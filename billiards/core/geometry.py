@@ -1,147 +1,550 @@
+from bisect import bisect_left
+from copy import copy
+from functools import partial
+from math import isfinite
 from itertools import tee
 
-from numpy import allclose, concatenate
-from sympy import (EmptySet, Interval, Segment2D,
-                   diff, parse_expr, symbols, floor)
-from sympy.calculus.util import maximum, minimum
-
-from billiards.utils.misc import to_expr
+from numpy import (allclose, arctan2, array, asarray, clip, concatenate,
+                   empty, errstate, float64, fmax, hypot, insert)
+from numpy import isfinite as np_isfinite
+from numpy import (linspace, nanargmax, nonzero, pi, searchsorted, unique,
+                   where)
+from sympy import EmptySet, Interval, Symbol, diff, floor, symbols
+
+from billiards.core.kernels import (compile_source, generate_source,
+                                    make_fallback_kernel)
+from billiards.exceptions import (NonFiniteValueException,
+                                  UnsupportedExpressionException)
+from billiards.numeric_methods import find_zero
+from billiards.utils.misc import parse_expression, to_expr
 from billiards.utils.time import sharedTimer as timer
 
 
 class SimplePath:
-    def __init__(self, t0, t1, x, y):
-        self.t0 = to_expr(t0)
-        self.t1 = to_expr(t1)
+    '''Parametric curve t -> (x(t), y(t)), t in (t0, t1).
+
+    The expressions may have free symbols other than t, the path's
+    parameters (e.g. "a*cos(t)" or "eps*exp(-1/(1-t**2))"), whose values are
+    given in the dictionary parameters. The values are bound at evaluation,
+    so with_parameters returns the other members of the path's family
+    without parsing, differentiating or compiling again.
+    '''
+
+    def __init__(self, t0, t1, x, y, parameters={}):
+        self.expressionX = parse_expression(x)
+        self.expressionY = parse_expression(y)
+
+        t = symbols('t')
+        expressionDx = diff(self.expressionX, t)
+        expressionDy = diff(self.expressionY, t)
+        self.initialize(
+            to_expr(t0), to_expr(t1),
+            self.expressionX, self.expressionY,
+            expressionDx, expressionDy,
+            diff(expressionDx, t), diff(expressionDy, t),
+            parameters=parameters
+        )
+
+    def initialize(
+        self,
+        t0,
+        t1,
+        expressionX,
+        expressionY,
+        expressionDx,
+        expressionDy,
+        expressionDdx,
+        expressionDdy,
+        kernelSources={},
+        endpoints=None,
+        parameters={}
+    ):
+        '''Sets up the path from its parsed domain and expressions.
+
+        kernelSources: Previously generated kernel sources (see compile).
+        endpoints: Previously evaluated start and end points.
+        parameters: Values of the expressions' free symbols other than t.
+        Values of other symbols are ignored.
+        '''
+        self.t0 = t0
+        self.t1 = t1
         self.length = self.t1 - self.t0
 
+        if len(self.length.free_symbols) > 0:
+            raise Exception(
+                f"The domain ({t0}, {t1}) can't depend on parameters."
+            )
+
         if self.length < 0:
             raise Exception("Can not instantiate a path with negative length!")
 
         self.lengthFloat = float(self.length.evalf())
+        self.t0Float = float(self.t0.evalf())
+        self.t1Float = float(self.t1.evalf())
+
+        self.expressionX = expressionX
+        self.expressionY = expressionY
+        self.expressionDx = expressionDx
+        self.expressionDy = expressionDy
+        self.expressionDdx = expressionDdx
+        self.expressionDdy = expressionDdy
 
         t = symbols('t')
-        ################################################################################
-        # Rethink that solution (https://github.com/YGVilela/Dynamical-Billiards/issues/6)
-        maxAttempts = 10
-        currentAttempt = 1
-        while True:
-            try:
-                print(f"Parsing {x}")
-                self.expressionX = parse_expr(x)
+        names = sorted(
+            str(symbol)
+            for symbol in expressionX.free_symbols | expressionY.free_symbols
+            if symbol != t
+        )
+        missing = [name for name in names if name not in parameters]
+        if len(missing) > 0:
+            raise Exception(
+                f"Missing values for the parameters {missing} of {self}."
+            )
+        self.parameters = {name: float(parameters[name]) for name in names}
+        self.parameterSymbols = [Symbol(name) for name in names]
 
-                break
-            except BaseException as err:
-                print(f"Error parsing {x}.")
-                print(err.message)
-                currentAttempt += 1
-            
-            if currentAttempt > maxAttempts:
-                print(f"Coudln't parse expression {x} in {maxAttempts}.")
-                raise Exception(f"Coudln't parse expression {x} in {maxAttempts}.")
-
-        currentAttempt = 10
-        while True:
-            try:
-                self.expressionY = parse_expr(y)
+        self.compile(kernelSources)
 
-                break
-            except BaseException as err:
-                print(f"Error parsing {y}.")
-                print(err.message)
-                currentAttempt += 1
-            
-            if currentAttempt > maxAttempts:
-                print(f"Coudln't parse expression {y} in {maxAttempts}.")
-                raise Exception(f"Coudln't parse expression {y} in {maxAttempts}.")
-        ################################################################################
-
-        self.expressionDx = diff(self.expressionX, t)
-        self.expressionDy = diff(self.expressionY, t)
-        
-        self.startpoint = [
-            float(self.expressionX.evalf(subs={t: self.t0})),
-            float(self.expressionY.evalf(subs={t: self.t0}))
-        ]
-        self.endpoint = [
-            float(self.expressionX.evalf(subs={t: self.t1})),
-            float(self.expressionY.evalf(subs={t: self.t1}))
-        ]
+        if endpoints is not None:
+            self.startpoint, self.endpoint = endpoints
+        else:
+            substitutions = self.parameter_substitutions()
+            self.startpoint = [
+                float(self.expressionX.evalf(
+                    subs={**substitutions, t: self.t0}
+                )),
+                float(self.expressionY.evalf(
+                    subs={**substitutions, t: self.t0}
+                ))
+            ]
+            self.endpoint = [
+                float(self.expressionX.evalf(
+                    subs={**substitutions, t: self.t1}
+                )),
+                float(self.expressionY.evalf(
+                    subs={**substitutions, t: self.t1}
+                ))
+            ]
+
+        # Polylines by tolerance, see poligonize
+        self.polylines = {}
+        self.containingBoxes = {}
+
+    def parameter_substitutions(self):
+        return {
+            symbol: self.parameters[str(symbol)]
+            for symbol in self.parameterSymbols
+        }
+
+    def with_parameters(self, values):
+        '''Returns the member of the path's family with the given parameter
+        values (the current ones for the parameters not given). It shares
+        the expressions and the compiled kernels of this path.
+        '''
+        path = copy(self)
+        path.parameters = {
+            name: float(values.get(name, value))
+            for name, value in self.parameters.items()
+        }
+        path.bind_kernels()
+
+        path.polylines = {}
+        path.containingBoxes = {}
+        if len(path.parameters) > 0:
+            path.startpoint = path.get_point(path.t0Float, evaluate=True)
+            path.endpoint = path.get_point(path.t1Float, evaluate=True)
+
+        return path
+
+    def compile(self, kernelSources={}):
+        '''Compiles the path's expressions into numeric functions, used
+        whenever the path is evaluated with evaluate=True. The kernels
+        receive t followed by the parameters, bound by bind_kernels.
+
+        kernelSources: Sources to reuse instead of generating them, indexed
+        like self.kernelSources. Missing kernels are generated.
+
+        Kernels with functions their module lacks are evaluated by
+        make_fallback_kernel instead, and have no source.
+        '''
+        t = symbols('t')
+        arguments = [t] + self.parameterSymbols
+        point = [self.expressionX, self.expressionY]
+        tangent = [self.expressionDx, self.expressionDy]
+        secondDerivative = [self.expressionDdx, self.expressionDdy]
+
+        frame = point + tangent
+        secondOrderFrame = frame + secondDerivative
+
+        kernels = {
+            "point": ("point", point, "math"),
+            "tangent": ("tangent", tangent, "math"),
+            "secondDerivative": ("secondDerivative", secondDerivative, "math"),
+            "frame": ("frame", frame, "math"),
+            "secondOrderFrame": ("secondOrderFrame", secondOrderFrame, "math"),
+            "pointVector": ("point", point, "numpy"),
+            "tangentVector": ("tangent", tangent, "numpy"),
+            "secondDerivativeVector": (
+                "secondDerivative", secondDerivative, "numpy"
+            ),
+            "frameVector": ("frame", frame, "numpy"),
+            "secondOrderFrameVector": (
+                "secondOrderFrame", secondOrderFrame, "numpy"
+            )
+        }
+
+        self.kernelSources = {}
+        self.kernels = {}
+        for key, (name, expressions, module) in kernels.items():
+            source = kernelSources.get(key)
+            if source is None:
+                try:
+                    source = generate_source(
+                        name, arguments, expressions, module
+                    )
+                except UnsupportedExpressionException:
+                    self.kernels[key] = make_fallback_kernel(
+                        name, arguments, expressions, module
+                    )
+                    self.kernelSources[key] = None
+                    continue
+
+            self.kernels[key] = compile_source(name, source, module)
+            self.kernelSources[key] = source
+
+        self.bind_kernels()
+
+    def bind_kernels(self):
+        '''Sets the functions of t used to evaluate the path, the kernels
+        with the current parameter values.
+        '''
+        if len(self.parameters) > 0:
+            functions = {
+                key: partial(kernel, **self.parameters)
+                for key, kernel in self.kernels.items()
+            }
+        else:
+            functions = self.kernels
+
+        self.pointFunction = functions["point"]
+        self.tangentFunction = functions["tangent"]
+        self.secondDerivativeFunction = functions["secondDerivative"]
+        self.pointFunctionVector = functions["pointVector"]
+        self.tangentFunctionVector = functions["tangentVector"]
+        self.secondDerivativeFunctionVector = \
+            functions["secondDerivativeVector"]
+        self.frameFunction = functions["frame"]
+        self.frameFunctionVector = functions["frameVector"]
+        self.secondOrderFrameFunction = functions["secondOrderFrame"]
+        self.secondOrderFrameFunctionVector = \
+            functions["secondOrderFrameVector"]
+
+    def evaluate_function(self, function, vectorFunction, s):
+        # The math functions raise on singularities (e.g. the endpoints of
+        # a bump function), where numpy returns the limit or nan instead.
+        try:
+            values = function(s)
+        except (ArithmeticError, ValueError):
+            with errstate(all="ignore"):
+                values = vectorFunction(float64(s))
+
+        values = [float(value) for value in values]
+        # A nan or infinite value makes the sum nan or infinite
+        if not isfinite(sum(values)):
+            raise NonFiniteValueException(
+                f"Path {self} doesn't evaluate to finite values on t = {s}."
+            )
 
-        self.poligonal = None
-        self.poligonalDelta = 0
+        return values
 
     def get_point(self, s, evaluate=False):
-        if s < self.t0 or s > self.t1:
+        if evaluate:
+            s = float(s)
+            t0, t1 = self.t0Float, self.t1Float
+        else:
+            t0, t1 = self.t0, self.t1
+
+        if s < t0 or s > t1:
             raise Exception(
                 f"Parameter {s} not in path's domain ({self.t0}, {self.t1})."
             )
 
         idGetPoint = timer.start_operation("get_point")
-        t = symbols('t')
-        x = self.expressionX.subs(t, s)
-        y = self.expressionY.subs(t, s)
-
         if evaluate:
-            x = float(x.evalf())
-            y = float(y.evalf())
+            x, y = self.evaluate_function(
+                self.pointFunction, self.pointFunctionVector, s
+            )
+        else:
+            substitutions = {**self.parameter_substitutions(), symbols('t'): s}
+            x = self.expressionX.subs(substitutions)
+            y = self.expressionY.subs(substitutions)
 
         timer.end_operation("get_point", idGetPoint)
         return [x, y]
 
     def get_tangent(self, s, evaluate=False):
-        if s < self.t0 or s > self.t1:
+        if evaluate:
+            s = float(s)
+            t0, t1 = self.t0Float, self.t1Float
+        else:
+            t0, t1 = self.t0, self.t1
+
+        if s < t0 or s > t1:
             raise Exception("Parameter outside the path's domain.")
 
-        t = symbols('t')
-        x = self.expressionDx.subs(t, s)
-        y = self.expressionDy.subs(t, s)
+        if evaluate:
+            return self.evaluate_function(
+                self.tangentFunction, self.tangentFunctionVector, s
+            )
 
+        substitutions = {**self.parameter_substitutions(), symbols('t'): s}
+        x = self.expressionDx.subs(substitutions)
+        y = self.expressionDy.subs(substitutions)
+
+        return [x, y]
+
+    def get_second_derivative(self, s, evaluate=False):
         if evaluate:
-            return [float(x.evalf()), float(y.evalf())]
+            s = float(s)
+            t0, t1 = self.t0Float, self.t1Float
+        else:
+            t0, t1 = self.t0, self.t1
+
+        if s < t0 or s > t1:
+            raise Exception("Parameter outside the path's domain.")
+
+        if evaluate:
+            return self.evaluate_function(
+                self.secondDerivativeFunction,
+                self.secondDerivativeFunctionVector,
+                s
+            )
+
+        substitutions = {**self.parameter_substitutions(), symbols('t'): s}
+        x = self.expressionDdx.subs(substitutions)
+        y = self.expressionDdy.subs(substitutions)
+
+        return [x, y]
+
+    def get_frame(self, s, evaluate=False, secondOrder=False):
+        '''Returns the point and the tangent at s, [x, y, dx, dy], followed
+        by the second derivative, [ddx, ddy], if secondOrder. Evaluated
+        together, their common subexpressions are computed once.
+        '''
+        if evaluate:
+            s = float(s)
+            t0, t1 = self.t0Float, self.t1Float
+        else:
+            t0, t1 = self.t0, self.t1
+
+        if s < t0 or s > t1:
+            raise Exception("Parameter outside the path's domain.")
+
+        if evaluate:
+            if secondOrder:
+                return self.evaluate_function(
+                    self.secondOrderFrameFunction,
+                    self.secondOrderFrameFunctionVector,
+                    s
+                )
+
+            return self.evaluate_function(
+                self.frameFunction, self.frameFunctionVector, s
+            )
+
+        expressions = [
+            self.expressionX, self.expressionY,
+            self.expressionDx, self.expressionDy
+        ]
+        if secondOrder:
+            expressions += [self.expressionDdx, self.expressionDdy]
+
+        substitutions = {**self.parameter_substitutions(), symbols('t'): s}
+        return [expression.subs(substitutions) for expression in expressions]
+
+    def evaluate_vector_function(self, vectorFunction, ts):
+        ts = asarray(ts, dtype=float)
+        if ((ts < self.t0Float) | (ts > self.t1Float)).any():
+            raise Exception(
+                f"Parameters not in path's domain ({self.t0}, {self.t1})."
+            )
+
+        with errstate(all="ignore"):
+            values = vectorFunction(ts)
+
+        return array(values, dtype=float)
+
+    def get_points(self, ts):
+        '''Evaluates the path on an array of parameters. Returns an array
+        with shape (2, *ts.shape).
+        '''
+        return self.evaluate_vector_function(self.pointFunctionVector, ts)
+
+    def get_tangents(self, ts):
+        return self.evaluate_vector_function(self.tangentFunctionVector, ts)
+
+    def get_second_derivatives(self, ts):
+        return self.evaluate_vector_function(
+            self.secondDerivativeFunctionVector, ts
+        )
+
+    def get_frames(self, ts):
+        '''Vectorized get_frame. Returns an array with shape (4, *ts.shape).
+        '''
+        return self.evaluate_vector_function(self.frameFunctionVector, ts)
+
+    def poligonize(self, tolerance=1e-3, initialSegments=16, maxDepth=20):
+        '''Returns a polyline within tolerance of the path, as the arrays of
+        the vertices' parameters and points, with shape (2, n).
+
+        Segments are split while their chord error, estimated from the
+        deviation of the midpoint and from the second derivative, exceeds
+        tolerance, so the vertices concentrate where the path bends. The
+        polylines are cached by tolerance, and refining starts from the
+        nearest coarser one.
+        '''
+        if tolerance in self.polylines:
+            return self.polylines[tolerance]
+
+        coarser = [key for key in self.polylines if key > tolerance]
+        if len(coarser) > 0:
+            ts, points = self.polylines[min(coarser)]
         else:
-            return [x, y]
+            segments = initialSegments if self.lengthFloat > 0 else 1
+            ts = linspace(self.t0Float, self.t1Float, segments + 1)
+            points = self.get_points(ts)
+
+        minWidth = self.lengthFloat * 2 ** -maxDepth
+        while True:
+            widths = ts[1:] - ts[:-1]
+            middles = ts[:-1] + widths / 2
+            middlePoints = self.get_points(middles)
+            deviations = hypot(*(
+                middlePoints - (points[:, :-1] + points[:, 1:]) / 2
+            ))
+            bounds = hypot(*self.get_second_derivatives(middles)) * \
+                widths ** 2 / 8
+            with errstate(invalid="ignore"):
+                split = (fmax(deviations, bounds) > tolerance) & \
+                    (widths > minWidth)
+
+            if not split.any():
+                break
+
+            indexes = split.nonzero()[0] + 1
+            ts = insert(ts, indexes, middles[split])
+            points = insert(points, indexes, middlePoints[:, split], axis=1)
+
+        self.polylines[tolerance] = (ts, points)
+
+        return ts, points
+
+    def containing_box(self, tolerance=1e-4, padding=False):
+        '''Returns the box (xMin, yMin, xMax, yMax) containing the path.
+
+        The extrema of the coordinates on the path's polyline (see
+        poligonize) are refined by solving x'(t) = 0 or y'(t) = 0 next to
+        them.
+
+        padding: Whether to expand the box by tolerance, the chord error of
+        the polyline, so it also contains the extrema the refinement misses,
+        as it is only done next to the outermost vertex.
+        '''
+        key = (tolerance, padding)
+        if key in self.containingBoxes:
+            return self.containingBoxes[key]
+
+        ts, points = self.poligonize(tolerance)
 
-    def poligonize(self, deltaT=.1):
-        if self.poligonal is not None and deltaT >= self.poligonalDelta:
-            return self.poligonal
+        box = []
+        for coordinate, sign in ((0, -1), (1, -1), (0, 1), (1, 1)):
+            values = sign * points[coordinate]
+            index = int(nanargmax(values))
+            extremum = float(values[index])
 
-        segments = []
+            if 0 < index < len(ts) - 1:
+                t = self.find_extremum(
+                    coordinate, sign, ts[index - 1], ts[index + 1]
+                )
+                if t is not None:
+                    point = self.get_point(t, evaluate=True)
+                    extremum = max(extremum, sign * point[coordinate])
 
-        t0 = self.t0
-        while t0 < self.t1:
-            t1 = min(t0 + deltaT, self.t1)
+            if padding:
+                extremum += tolerance
 
-            segment = Segment2D(self.get_point(t0), self.get_point(t1))
-            if isinstance(segment, Segment2D):
-                segments.append(segment)
+            box.append(sign * extremum)
 
-            t0 = t1
+        self.containingBoxes[key] = tuple(box)
 
-        self.poligonal = segments
-        self.poligonalDelta = deltaT
+        return self.containingBoxes[key]
 
-        return segments
+    def find_extremum(self, coordinate, sign, start, end):
+        '''Finds the maximum of sign times the given coordinate between start
+        and end, where its derivative changes sign, or returns None.
 
-    def containing_box(self):
-        t = symbols("t")
-        xMin = minimum(self.expressionX, t, Interval(self.t0, self.t1))
-        xMax = maximum(self.expressionX, t, Interval(self.t0, self.t1))
-        yMin = minimum(self.expressionY, t, Interval(self.t0, self.t1))
-        yMax = maximum(self.expressionY, t, Interval(self.t0, self.t1))
+        The derivative is bracketed by Brent's method, which doesn't need the
+        second derivative, so it doesn't fail on degenerate extrema, where
+        both vanish.
+        '''
 
-        return xMin, yMin, xMax, yMax
+        def derivative(t):
+            return (sign * self.get_tangent(t, evaluate=True)[coordinate],)
+
+        if derivative(start)[0] <= 0 or derivative(end)[0] >= 0:
+            return None
+
+        return find_zero(
+            derivative, start, end, method="Brent", record=False
+        )
 
     def is_on_domain(self, t):
         return Interval(self.t0, self.t1).contains(t)
 
     def to_json(self):
-        return {
+        dictionaire = {
             "x": str(self.expressionX),
             "y": str(self.expressionY),
             "t0": str(self.t0),
             "t1": str(self.t1)
         }
+        if len(self.parameters) > 0:
+            dictionaire["parameters"] = dict(self.parameters)
+
+        return dictionaire
+
+    def to_compiled(self):
+        '''Returns the parsed and derived expressions and the kernel
+        sources, from which from_compiled rebuilds the path without parsing,
+        differentiating or generating code.
+        '''
+        return {
+            "t0": self.t0,
+            "t1": self.t1,
+            "x": self.expressionX,
+            "y": self.expressionY,
+            "dx": self.expressionDx,
+            "dy": self.expressionDy,
+            "ddx": self.expressionDdx,
+            "ddy": self.expressionDdy,
+            "kernelSources": self.kernelSources,
+            "endpoints": [self.startpoint, self.endpoint],
+            "parameters": self.parameters
+        }
+
+    def from_compiled(dictionaire):
+        path = SimplePath.__new__(SimplePath)
+        path.initialize(
+            dictionaire["t0"], dictionaire["t1"],
+            dictionaire["x"], dictionaire["y"],
+            dictionaire["dx"], dictionaire["dy"],
+            dictionaire["ddx"], dictionaire["ddy"],
+            dictionaire["kernelSources"],
+            dictionaire["endpoints"],
+            dictionaire["parameters"]
+        )
+
+        return path
 
     def from_json(dictionaire):
         return SimplePath(
@@ -149,6 +552,7 @@ class SimplePath:
             dictionaire["t1"],
             dictionaire["x"],
             dictionaire["y"],
+            dictionaire.get("parameters", {})
         )
 
     def __str__(self):
@@ -156,7 +560,13 @@ class SimplePath:
             str(self.expressionY) + "), with t in (" + \
             str(self.t0) + "," + str(self.t1) + ")"
 
-    def normal_disturb(self, function, domain):
+    def normal_disturb(self, function, domain, parameters={}):
+        '''Returns the paths obtained by moving the points of the domain
+        along the normal, by the given function of t.
+
+        parameters: Values of the function's parameters, if any.
+        '''
+        parameters = {**self.parameters, **parameters}
         pathDomain = Interval(self.t0, self.t1)
         intersection = pathDomain.intersect(domain)
         if intersection == EmptySet:
@@ -169,14 +579,14 @@ class SimplePath:
             t1 = intersection.start
             x = self.expressionX
             y = self.expressionY
-            path = SimplePath(str(t0), str(t1), str(x), str(y))
+            path = SimplePath(str(t0), str(t1), str(x), str(y), parameters)
             newPaths.append(path)
 
         t0 = intersection.start
         t1 = intersection.end
         x = self.expressionX + self.expressionDy * function
         y = self.expressionY - self.expressionDx * function
-        path = SimplePath(str(t0), str(t1), str(x), str(y))
+        path = SimplePath(str(t0), str(t1), str(x), str(y), parameters)
         newPaths.append(path)
 
         if intersection.end < self.t1:
@@ -184,7 +594,7 @@ class SimplePath:
             t1 = self.t1
             x = self.expressionX
             y = self.expressionY
-            path = SimplePath(str(t0), str(t1), str(x), str(y))
+            path = SimplePath(str(t0), str(t1), str(x), str(y), parameters)
             newPaths.append(path)
 
         return newPaths
@@ -194,8 +604,8 @@ class ComposedPath:
 
     # Todo: Change this "periodic". It's not right
     def __init__(self, paths=[], periodic=True):
-        self.t0 = parse_expr("0")
-        self.t1 = parse_expr("0")
+        self.t0 = parse_expression("0")
+        self.t1 = parse_expression("0")
         self.paths = []
         self.periodic = periodic
 
@@ -209,16 +619,66 @@ class ComposedPath:
 
         self.length = self.t1
         self.lengthFloat = float(self.length.evalf())
+        self.update_breakpoints()
+
+    def update_breakpoints(self):
+        '''Stores the components' start parameters as floats, used to
+        find the component of a parameter without symbolic comparisons.
+        Must be called whenever the components change.
+        '''
+        # Plain lists are faster than arrays for scalar lookups
+        self.breakpointList = [
+            float(component["relative_t0"].evalf())
+            for component in self.paths
+        ]
+        self.componentPaths = [component["path"] for component in self.paths]
+        self.breakpoints = array(self.breakpointList + [self.lengthFloat])
 
     def to_json(self):
         return [component["path"].to_json() for component in self.paths]
 
-    def from_json(componentArray):
+    def from_json(componentArray, parameters={}):
+        '''parameters: Values of the paths' parameters, overriding the ones
+        given in the components.
+        '''
         paths = [
-            SimplePath.from_json(component) for component in componentArray
+            SimplePath.from_json({
+                **component,
+                "parameters": {
+                    **component.get("parameters", {}), **parameters
+                }
+            })
+            for component in componentArray
         ]
         return ComposedPath(paths)
 
+    def get_parameters(self):
+        '''Returns the parameters of the components and their values. A
+        parameter shared by several components takes the value of the first
+        one.
+        '''
+        parameters = {}
+        for path in self.componentPaths:
+            for name, value in path.parameters.items():
+                parameters.setdefault(name, value)
+
+        return parameters
+
+    def with_parameters(self, values):
+        '''Returns the member of the boundary's family with the given
+        parameter values (see SimplePath.with_parameters). The components
+        share the compiled kernels of this boundary's, and the domains (so
+        the breakpoints) are the same.
+        '''
+        boundary = copy(self)
+        boundary.paths = [
+            {**component, "path": component["path"].with_parameters(values)}
+            for component in self.paths
+        ]
+        boundary.update_breakpoints()
+
+        return boundary
+
     def is_continuous(self):
         # https://docs.python.org/3/library/itertools.html#itertools.pairwise
         a, b = tee(self.paths)
@@ -243,65 +703,260 @@ class ComposedPath:
 
         return allclose(firstPath.startpoint, lastPath.endpoint)
 
-    def get_point(self, s, evaluate=False):
-        if self.periodic and s > self.length:
-            s = s % self.length
+    def find_component(self, s, evaluate=False):
+        '''Returns the component containing the parameter s and the
+        corresponding parameter on the component's own domain.
+        '''
+        sFloat = float(s)
+        if self.periodic and (sFloat < 0 or sFloat > self.lengthFloat):
+            sFloat = sFloat % self.lengthFloat
+            s = sFloat if evaluate else s % self.length
+
+        if len(self.paths) == 0 or sFloat < 0 or sFloat > self.lengthFloat:
+            raise Exception("Can't evaluate path on t = " + str(s) +
+                            " lower than 0 or greater than the length " +
+                            str(self.length))
+
+        # A parameter on a breakpoint belongs to the earlier component.
+        index = max(bisect_left(self.breakpointList, sFloat) - 1, 0)
+        path = self.componentPaths[index]
+
+        if not evaluate:
+            return path, path.t0 + s - self.paths[index]["relative_t0"]
+
+        relative_s = path.t0Float + sFloat - self.breakpointList[index]
+        return path, min(max(relative_s, path.t0Float), path.t1Float)
+
+    def evaluate_adjacent(self, methodName, path, relative_s, evaluate,
+                          **kwargs):
+        '''Evaluates the given method of the component adjacent to path on
+        its endpoint relative_s, after path didn't evaluate to finite values
+        there (e.g. a bump function), as both share the point.
+        '''
+        index = next(
+            index for index, component in enumerate(self.componentPaths)
+            if component is path
+        )
+        if relative_s == path.t1Float:
+            index, endpoint = index + 1, "t0Float"
+        elif relative_s == path.t0Float:
+            index, endpoint = index - 1, "t1Float"
+        else:
+            raise NonFiniteValueException(
+                f"Path {path} doesn't evaluate to finite values on " +
+                f"t = {relative_s}."
+            )
 
-        for component in self.paths:
-            startPoint = component["relative_t0"]
-            endPoint = component["relative_t1"]
-            if startPoint <= s <= endPoint:
-                path = component["path"]
-                relative_s = path.t0 + s - startPoint
+        if self.periodic:
+            index = index % len(self.componentPaths)
+        elif index < 0 or index >= len(self.componentPaths):
+            raise NonFiniteValueException(
+                f"Path {path} doesn't evaluate to finite values on its " +
+                f"endpoint t = {relative_s}."
+            )
+
+        adjacentPath = self.componentPaths[index]
+        return getattr(adjacentPath, methodName)(
+            getattr(adjacentPath, endpoint), evaluate=evaluate, **kwargs
+        )
 
-                return path.get_point(relative_s, evaluate=evaluate)
+    def get_point(self, s, evaluate=False):
+        path, relative_s = self.find_component(s, evaluate)
 
-        raise Exception("Can't evaluate path on t = " + str(s) +
-                        " lower than 0 or greater than the length " +
-                        str(self.length))
+        try:
+            return path.get_point(relative_s, evaluate=evaluate)
+        except NonFiniteValueException:
+            return self.evaluate_adjacent(
+                "get_point", path, relative_s, evaluate
+            )
 
     def get_tangent(self, s, evaluate=False):
-        if self.periodic and s > self.length:
-            s = s % self.length
+        path, relative_s = self.find_component(s, evaluate)
 
-        for component in self.paths:
-            startPoint = component["relative_t0"]
-            endPoint = component["relative_t1"]
-            if s >= startPoint and s <= endPoint:
-                path = component["path"]
-                relative_s = path.t0 + s - component["relative_t0"]
+        try:
+            return path.get_tangent(relative_s, evaluate=evaluate)
+        except NonFiniteValueException:
+            return self.evaluate_adjacent(
+                "get_tangent", path, relative_s, evaluate
+            )
 
-                return path.get_tangent(relative_s, evaluate=evaluate)
+    def get_second_derivative(self, s, evaluate=False):
+        path, relative_s = self.find_component(s, evaluate)
+
+        try:
+            return path.get_second_derivative(relative_s, evaluate=evaluate)
+        except NonFiniteValueException:
+            return self.evaluate_adjacent(
+                "get_second_derivative", path, relative_s, evaluate
+            )
+
+    def get_frame(self, s, evaluate=False, secondOrder=False):
+        path, relative_s = self.find_component(s, evaluate)
+
+        try:
+            return path.get_frame(
+                relative_s, evaluate=evaluate, secondOrder=secondOrder
+            )
+        except NonFiniteValueException:
+            return self.evaluate_adjacent(
+                "get_frame", path, relative_s, evaluate,
+                secondOrder=secondOrder
+            )
+
+    def evaluate_components(self, ts, methodName, size=2):
+        ts = asarray(ts, dtype=float)
+        if self.periodic:
+            outside = (ts < 0) | (ts > self.lengthFloat)
+            ts = where(outside, ts % self.lengthFloat, ts)
+        elif ((ts < 0) | (ts > self.lengthFloat)).any():
+            raise Exception(
+                "Can't evaluate path on t lower than 0 or greater than the "
+                + "length " + str(self.length)
+            )
 
-        raise Exception(
-            "Can't evaluate path on t lower than 0 or greater than the length "
-            + str(self.length)
+        # A parameter on a breakpoint belongs to the earlier component, as
+        # in get_point.
+        indexes = searchsorted(self.breakpoints, ts, side="left") - 1
+        indexes = clip(indexes, 0, len(self.paths) - 1)
+
+        values = empty((size,) + ts.shape)
+        for index in unique(indexes):
+            mask = indexes == index
+            path = self.paths[index]["path"]
+            relativeTs = clip(
+                path.t0Float + ts[mask] - self.breakpoints[index],
+                path.t0Float, path.t1Float
+            )
+
+            values[:, mask] = getattr(path, methodName)(relativeTs)
+
+        # As in get_point, breakpoints where a component doesn't evaluate
+        # to finite values are evaluated on the adjacent one, by the scalar
+        # method (e.g. get_point for get_points).
+        nonFinite = ~np_isfinite(values).all(axis=0)
+        for position in zip(*nonzero(nonFinite)):
+            try:
+                values[(slice(None),) + position] = getattr(
+                    self, methodName[:-1]
+                )(ts[position], evaluate=True)
+            except NonFiniteValueException:
+                pass
+
+        return values
+
+    def get_points(self, ts):
+        '''Evaluates the path on an array of parameters. Returns an array
+        with shape (2, *ts.shape).
+        '''
+        return self.evaluate_components(ts, "get_points")
+
+    def get_tangents(self, ts):
+        return self.evaluate_components(ts, "get_tangents")
+
+    def get_second_derivatives(self, ts):
+        return self.evaluate_components(ts, "get_second_derivatives")
+
+    def get_frames(self, ts):
+        return self.evaluate_components(ts, "get_frames", 4)
+
+    def poligonize(self, tolerance=1e-3, components=None):
+        '''Joins the polylines of the components (see SimplePath.poligonize)
+        into a polyline parametrized as the boundary. Returns the arrays of
+        the vertices' parameters and points, and whether each pair of
+        consecutive vertices is a segment of the polyline, which is not the
+        case between components that don't connect.
+
+        components: Indexes of the components to include, all by default.
+        '''
+        if components is None:
+            components = range(len(self.paths))
+
+        ts = []
+        points = []
+        validSegments = []
+        previous = None
+        for index in components:
+            path = self.componentPaths[index]
+            pathTs, pathPoints = path.poligonize(tolerance)
+            pathTs = pathTs - path.t0Float + self.breakpointList[index]
+
+            if previous is None:
+                validSegments.extend([True] * (len(pathTs) - 1))
+            elif previous == index - 1 and \
+                    allclose(points[-1][:, -1], pathPoints[:, 0]):
+                # Shared vertex
+                pathTs = pathTs[1:]
+                pathPoints = pathPoints[:, 1:]
+                validSegments.extend([True] * len(pathTs))
+            else:
+                validSegments.append(False)
+                validSegments.extend([True] * (len(pathTs) - 1))
+
+            ts.append(pathTs)
+            points.append(pathPoints)
+            previous = index
+
+        if len(ts) == 0:
+            return empty(0), empty((2, 0)), array([], dtype=bool)
+
+        return (
+            concatenate(ts),
+            concatenate(points, axis=1),
+            array(validSegments, dtype=bool)
         )
 
-    def containing_box(self):
-        xMin = yMin = xMax = yMax = None
-        for component in self.paths:
-            path = component["path"]
-            curXMin, curYMin, curXMax, curYMax = path.containing_box()
+    def is_convex(self, tolerance=1e-5):
+        '''Whether the boundary is a closed convex curve, checked on its
+        polyline (see poligonize): the polyline must turn always to the
+        same side, and only once around.
 
-            if xMin is None:
-                xMin = curXMin
-                yMin = curYMin
-                xMax = curXMax
-                yMax = curYMax
+        tolerance: Maximum distance between the polyline and the boundary,
+        relative to the boundary's size.
+        '''
+        xMin, yMin, xMax, yMax = self.containing_box()
+        if xMin is None or not self.periodic:
+            return False
 
-                continue
+        size = max(xMax - xMin, yMax - yMin)
+        _, (xs, ys), validSegments = self.poligonize(tolerance * size)
+        if not validSegments.all():
+            return False
 
-            if xMin > curXMin:
-                xMin = curXMin
-            if yMin > curYMin:
-                yMin = curYMin
-            if xMax < curXMax:
-                xMax = curXMax
-            if yMax < curYMax:
-                yMax = curYMax
+        # Edges of the closed polyline, without the degenerate ones
+        edgesX = concatenate([xs[1:], xs[:1]]) - xs
+        edgesY = concatenate([ys[1:], ys[:1]]) - ys
+        lengths = hypot(edgesX, edgesY)
+        keep = lengths > 1e-12 * size
+        edgesX = edgesX[keep] / lengths[keep]
+        edgesY = edgesY[keep] / lengths[keep]
+        if len(edgesX) < 3:
+            return False
 
-        return xMin, yMin, xMax, yMax
+        nextX = concatenate([edgesX[1:], edgesX[:1]])
+        nextY = concatenate([edgesY[1:], edgesY[:1]])
+        turns = arctan2(
+            edgesX * nextY - edgesY * nextX, edgesX * nextX + edgesY * nextY
+        )
+
+        return (
+            ((turns >= -1e-9).all() or (turns <= 1e-9).all()) and
+            abs(abs(turns.sum()) - 2 * pi) < 1e-6
+        )
+
+    def containing_box(self, tolerance=1e-4, padding=False):
+        '''Returns the box (xMin, yMin, xMax, yMax) containing the
+        components' boxes (see SimplePath.containing_box).
+        '''
+        boxes = [
+            component["path"].containing_box(tolerance, padding)
+            for component in self.paths
+        ]
+        if len(boxes) == 0:
+            return None, None, None, None
+
+        xMins, yMins, xMaxs, yMaxs = zip(*boxes)
+
+        return min(xMins), min(yMins), max(xMaxs), max(yMaxs)
 
     def add_path(self, path: SimplePath):
         self.paths.append({
@@ -312,6 +967,7 @@ class ComposedPath:
         self.t1 = self.t1 + path.length
         self.length = self.t1
         self.lengthFloat = float(self.length.evalf())
+        self.update_breakpoints()
 
     def remove_path(self, index: int):
         removedComponent = self.paths.pop(index)
@@ -326,6 +982,7 @@ class ComposedPath:
         self.t1 = self.t1 - removedLength
         self.length = self.t1
         self.lengthFloat = float(self.length.evalf())
+        self.update_breakpoints()
 
     def update_path(self, index: int, newPath: SimplePath):
         oldPath = self.paths[index]["path"]
@@ -343,8 +1000,9 @@ class ComposedPath:
         self.t1 = self.t1 + lengthDifference
         self.length = self.t1
         self.lengthFloat = float(self.length.evalf())
+        self.update_breakpoints()
 
-    def normal_disturb(self, function, domain):
+    def normal_disturb(self, function, domain, parameters={}):
         domain[0] = to_expr(domain[0])
         domain[1] = to_expr(domain[1])
 
@@ -357,7 +1015,7 @@ class ComposedPath:
 
         rep0 = domain[0] % self.length
         rep1 = domain[1] % self.length
-        functionAsExpr = parse_expr(function)
+        functionAsExpr = parse_expression(function)
 
         # Disturbing interval doesn't cross the start/end point
         if rep0 < rep1 or rep1 == 0:
@@ -374,9 +1032,9 @@ class ComposedPath:
         else:
             repLength = domain[0] + (self.length - rep0)
             return self.normal_disturb(
-                function, [str(domain[0]), str(repLength)]
+                function, [str(domain[0]), str(repLength)], parameters
             ).normal_disturb(
-                function, [str(repLength), str(domain[1])]
+                function, [str(repLength), str(domain[1])], parameters
             )
 
         domainAsInter = Interval(domain[0], domain[1],
@@ -402,7 +1060,9 @@ class ComposedPath:
             shiftedDomain = Interval(intersection.start + shiftValue,
                                      intersection.end + shiftValue)
 
-            disturbedPaths = path.normal_disturb(shiftedFunc, shiftedDomain)
+            disturbedPaths = path.normal_disturb(
+                shiftedFunc, shiftedDomain, parameters
+            )
             newPaths.append(disturbedPaths)
 
         disturbedCurve = ComposedPath(concatenate(newPaths))
@@ -0,0 +1,209 @@
+import math
+from typing import Callable, List
+
+import numpy
+from sympy import Expr, Symbol, count_ops, cse, lambdify, numbered_symbols
+from sympy.printing.numpy import NumPyPrinter
+from sympy.printing.pycode import PythonCodePrinter
+
+from billiards.exceptions import UnsupportedExpressionException
+
+# Bump whenever the generated sources change, invalidating stored kernels
+KERNEL_VERSION = 2
+
+PRINTERS = {
+    "math": PythonCodePrinter,
+    "numpy": NumPyPrinter
+}
+
+NAMESPACES = {
+    "math": {"math": math},
+    "numpy": {"numpy": numpy}
+}
+
+
+def generate_source(
+    name: str,
+    arguments: List[Symbol],
+    expressions: List[Expr],
+    module: str = "math"
+):
+    '''Generates the source of a python function that evaluates the given
+    expressions on the given arguments and returns them as a tuple.
+    Subexpressions shared by the expressions are computed once.
+
+    module: "math" for scalar evaluation or "numpy" for evaluation over
+    arrays. Expressions that don't depend on the first argument are
+    broadcast to its shape on the "numpy" variant.
+
+    Raises UnsupportedExpressionException if the module lacks some of the
+    expressions' functions (see make_fallback_kernel).
+    '''
+
+    if module not in PRINTERS:
+        raise Exception(f"Invalid kernel module {module}")
+
+    printer = PRINTERS[module]()
+    variable = arguments[0]
+    replacements, reduced = eliminate_subexpressions(expressions)
+
+    def doprint(expression):
+        try:
+            return printer.doprint(expression)
+        # The printers raise ValueError on expressions they can print
+        # partially, as derivatives of functions of non symbols
+        except (NotImplementedError, ValueError) as exception:
+            raise UnsupportedExpressionException(str(exception))
+
+    argumentNames = ", ".join(str(argument) for argument in arguments)
+    lines = [f"def {name}({argumentNames}):"]
+    for symbol, expression in replacements:
+        lines.append(f"    {symbol} = {doprint(expression)}")
+
+    # Free symbols of the replaced subexpressions, to tell which outputs
+    # depend on the variable
+    dependencies = {}
+    for symbol, expression in replacements:
+        dependencies[symbol] = set(expression.free_symbols)
+        for other in expression.free_symbols & dependencies.keys():
+            dependencies[symbol] |= dependencies[other]
+
+    outputs = []
+    for expression in reduced:
+        code = doprint(expression)
+        freeSymbols = set(expression.free_symbols)
+        for symbol in expression.free_symbols & dependencies.keys():
+            freeSymbols |= dependencies[symbol]
+
+        if module == "numpy" and variable not in freeSymbols:
+            code = f"numpy.full_like({variable}, {code}, dtype=float)"
+
+        outputs.append(code)
+
+    lines.append(f"    return ({', '.join(outputs)},)")
+
+    # The printers fall back to other modules for some functions (e.g.
+    # math.erf on the "numpy" variant), which the kernel can't call
+    foreignModules = set(printer.module_imports) - set(NAMESPACES[module])
+    if len(foreignModules) > 0:
+        raise UnsupportedExpressionException(
+            f"The expressions {expressions} need the modules "
+            + f"{sorted(foreignModules)}, not available to {module} kernels."
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def eliminate_subexpressions(expressions: List[Expr]):
+    '''Common subexpression elimination over all the expressions. Returns
+    the list of (symbol, subexpression) replacements, in order of
+    evaluation, and the reduced expressions.
+    '''
+    return cse(expressions, symbols=numbered_symbols("_cse"))
+
+
+def operation_counts(expressions: List[Expr]):
+    '''Number of operations to evaluate the expressions separately and
+    after common subexpression elimination.
+    '''
+    replacements, reduced = eliminate_subexpressions(expressions)
+
+    return {
+        "before": sum(count_ops(expression) for expression in expressions),
+        "after": sum(
+            count_ops(expression)
+            for expression in [rhs for _, rhs in replacements] + reduced
+        )
+    }
+
+
+def compile_source(name: str, source: str, module: str = "math") -> Callable:
+    '''Executes a source generated by generate_source and returns the
+    resulting function, with the source attached as "source".
+    '''
+
+    namespace = dict(NAMESPACES[module])
+    exec(compile(source, f"<kernel {name}>", "exec"), namespace)
+
+    function = namespace[name]
+    function.source = source
+
+    return function
+
+
+def compile_kernel(
+    name: str,
+    arguments: List[Symbol],
+    expressions: List[Expr],
+    module: str = "math"
+) -> Callable:
+    source = generate_source(name, arguments, expressions, module)
+
+    return compile_source(name, source, module)
+
+
+def make_fallback_kernel(
+    name: str,
+    arguments: List[Symbol],
+    expressions: List[Expr],
+    module: str = "math"
+) -> Callable:
+    '''Returns a function with the interface of the kernels, for the
+    expressions that generate_source can't handle. They are evaluated by
+    mpmath, or by sympy for the functions mpmath lacks, and by substitution
+    if they can't be printed at all (e.g. unevaluated derivatives), so they
+    are much slower. Values that don't evaluate to numbers are nan. The
+    "numpy" variant evaluates the elements one by one.
+    '''
+
+    try:
+        scalarFunction = lambdify(
+            arguments, expressions, modules=["mpmath", "sympy"]
+        )
+    except (NotImplementedError, ValueError):
+        names = [str(argument) for argument in arguments]
+
+        def scalarFunction(*values, **parameters):
+            substitutions = dict(zip(arguments, values))
+            substitutions.update({
+                argument: parameters[name]
+                for argument, name in zip(arguments, names)
+                if name in parameters
+            })
+
+            return [
+                expression.evalf(subs=substitutions)
+                for expression in expressions
+            ]
+
+    def to_float(value):
+        # Values that don't evaluate to numbers (e.g. derivatives of sign)
+        # are nan, which the paths refuse (see SimplePath.evaluate_function)
+        try:
+            return float(value)
+        except TypeError:
+            return math.nan
+
+    def scalar_kernel(*values, **parameters):
+        return tuple(
+            to_float(value) for value in scalarFunction(*values, **parameters)
+        )
+
+    def vector_kernel(variable, *values, **parameters):
+        variables = numpy.asarray(variable, dtype=float)
+        rows = [
+            scalar_kernel(element, *values, **parameters)
+            for element in variables.flat
+        ]
+
+        return tuple(
+            numpy.array(rows, dtype=float).T.reshape(
+                (len(expressions),) + variables.shape
+            )
+        )
+
+    kernel = vector_kernel if module == "numpy" else scalar_kernel
+    kernel.__name__ = name
+    kernel.source = None
+
+    return kernel
@@ -0,0 +1,304 @@
+from bisect import bisect_right
+from math import atan2, cos, inf, pi, sin
+from typing import List, Tuple
+
+from numpy import array, ndarray, roll
+
+from billiards.core.geometry import ComposedPath
+from billiards.core.primitives import LinePrimitive, detect_primitive
+
+
+class PolygonalBilliard:
+    '''Billiard map on boundaries made only of straight segments, computed
+    by exact ray-edge intersection.
+
+    A ray through a vertex hits both edges that share it at the same
+    distance. The edges are treated as half-open, so the hit is assigned to
+    the edge that starts at the vertex. Hits within vertexTolerance (of the
+    edge's length) of a vertex are reflected off the edge hit, and if the
+    ray then leaves the table, off both edges, in either order, or else
+    back along itself (see reflect_at_vertex).
+
+    Rays leaving with angle within acc of 0 or pi run along the edge, so
+    those conditions are kept fixed.
+    '''
+
+    def __init__(
+        self,
+        boundary: ComposedPath,
+        lines: List[LinePrimitive],
+        minDistance=1e-11,
+        acc=1e-13,
+        vertexTolerance=1e-9
+    ):
+        vertices = []
+        edges = []
+        phiStarts = []
+        phiLengths = []
+        tangents = []
+        for index, line in enumerate(lines):
+            path = boundary.componentPaths[index]
+            if path.lengthFloat == 0:
+                continue
+
+            ox, oy = line.origin
+            dx, dy = line.direction
+            length = line.t1 - line.t0
+            vertices.append((ox + line.t0 * dx, oy + line.t0 * dy))
+            edges.append((length * dx, length * dy))
+            phiStarts.append(boundary.breakpointList[index])
+            phiLengths.append(path.lengthFloat)
+            tangents.append((dx, dy))
+
+        self.vertices = array(vertices)
+        self.edges = array(edges)
+        self.phiStarts = array(phiStarts)
+        self.phiLengths = array(phiLengths)
+        self.period = boundary.lengthFloat
+        self.minDistance = minDistance
+        self.acc = acc
+        self.vertexTolerance = vertexTolerance
+
+        # Side of the edges the table is on: 1 if the vertices are in
+        # counterclockwise order, -1 otherwise
+        xs, ys = self.vertices[:, 0], self.vertices[:, 1]
+        area = (xs * (roll(ys, -1) - roll(ys, 1))).sum()
+        self.orientation = 1.0 if area >= 0 else -1.0
+
+        # Plain lists are faster than arrays for the scalar loop
+        edgeNorms = (self.edges ** 2).sum(axis=1) ** .5
+        self.edgeData = list(zip(
+            self.vertices[:, 0].tolist(), self.vertices[:, 1].tolist(),
+            self.edges[:, 0].tolist(), self.edges[:, 1].tolist(),
+            (self.edges[:, 0] / edgeNorms).tolist(),
+            (self.edges[:, 1] / edgeNorms).tolist()
+        ))
+        self.phiStartList = phiStarts
+        self.phiLengthList = phiLengths
+        self.tangentList = tangents
+
+    def find_edge(self, phi: float):
+        '''Returns the edge containing the parameter phi and the position on
+        the edge, between 0 and 1.
+        '''
+        phi = phi % self.period
+        index = max(bisect_right(self.phiStartList, phi) - 1, 0)
+        u = (phi - self.phiStartList[index]) / self.phiLengthList[index]
+
+        return index, min(max(u, 0.0), 1.0)
+
+    def step(self, index: int, u: float, theta: float):
+        '''Computes the next collision of the ray leaving the position u of
+        the given edge with angle theta. Returns the edge and the position of
+        the collision, the new angle and the collision point.
+        '''
+        vx, vy, ex, ey, tx, ty = self.edgeData[index]
+        x0 = vx + u * ex
+        y0 = vy + u * ey
+        dx = tx * cos(theta) - ty * sin(theta)
+        dy = ty * cos(theta) + tx * sin(theta)
+
+        minDistance = self.minDistance
+        tieTolerance = 1e-12
+        nearestS = inf
+        nearestIndex = -1
+        nearestU = 0.0
+        for otherIndex, (vx, vy, ex, ey, _, _) in enumerate(self.edgeData):
+            if otherIndex == index:
+                continue
+
+            denominator = dx * ey - dy * ex
+            if denominator == 0:
+                continue
+
+            ox = vx - x0
+            oy = vy - y0
+            s = (ox * ey - oy * ex) / denominator
+            if s <= minDistance or s > nearestS + tieTolerance:
+                continue
+
+            otherU = (ox * dy - oy * dx) / denominator
+            if otherU < -tieTolerance or otherU > 1 + tieTolerance:
+                continue
+
+            # On a tie (a vertex) keep the edge that starts there
+            if s < nearestS - tieTolerance or otherU < nearestU:
+                nearestS = s
+                nearestIndex = otherIndex
+                nearestU = otherU
+
+        if nearestIndex < 0:
+            raise Exception(
+                f"Ray from {(x0, y0)} with direction {(dx, dy)} doesn't hit "
+                + "the polygon."
+            )
+
+        nearestU = min(max(nearestU, 0.0), 1.0)
+        if nearestU < self.vertexTolerance:
+            return self.reflect_at_vertex(nearestIndex, nearestIndex, dx, dy)
+        if nearestU > 1 - self.vertexTolerance:
+            return self.reflect_at_vertex(
+                (nearestIndex + 1) % len(self.edgeData), nearestIndex, dx, dy
+            )
+
+        _, _, _, _, tx, ty = self.edgeData[nearestIndex]
+        newTheta = atan2(dx * ty - dy * tx, dx * tx + dy * ty)
+
+        return (
+            nearestIndex, nearestU, newTheta,
+            x0 + nearestS * dx, y0 + nearestS * dy
+        )
+
+    def reflect_at_vertex(self, index: int, hitIndex: int, dx, dy):
+        '''Reflects the ray with direction (dx, dy) that hits the vertex
+        where the given edge starts, off the edge hit (hitIndex), which is
+        it or the previous one. If the reflected ray leaves the table, it's
+        reflected off both edges, in either order, and if it still does, it
+        goes back along itself. Returns the same as step.
+
+        The new angle, in [0, pi], is measured against the edge the ray
+        leaves from: the one starting at the vertex, at position 0, or, if
+        the ray only enters the table on the side of the previous one (at a
+        reflex vertex), the previous edge, at position 1 - vertexTolerance,
+        so its parameter is found on that edge.
+        '''
+        previousIndex = index - 1
+        hitTangent = self.tangentList[hitIndex]
+        otherTangent = self.tangentList[
+            previousIndex if hitIndex == index else index
+        ]
+
+        def reflect(direction, tangent):
+            projection = 2 * (direction[0] * tangent[0] +
+                              direction[1] * tangent[1])
+            return (
+                projection * tangent[0] - direction[0],
+                projection * tangent[1] - direction[1]
+            )
+
+        firstReflection = reflect((dx, dy), hitTangent)
+        candidates = [
+            firstReflection,
+            reflect(firstReflection, otherTangent),
+            reflect(reflect((dx, dy), otherTangent), hitTangent),
+            (-dx, -dy)
+        ]
+
+        orientation = self.orientation
+        tx, ty = self.tangentList[index]
+        px, py = self.tangentList[previousIndex]
+        convex = orientation * (px * ty - py * tx) > 0
+        for rx, ry in candidates:
+            afterSide = orientation * (tx * ry - ty * rx)
+            beforeSide = orientation * (px * ry - py * rx)
+            if convex and afterSide > self.acc and beforeSide > self.acc:
+                break
+            if not convex and (afterSide > self.acc or beforeSide > self.acc):
+                break
+
+        if tx * ry - ty * rx < 0 and px * ry - py * rx > 0:
+            index = previousIndex % len(self.edgeData)
+            tx, ty = px, py
+            u = 1 - self.vertexTolerance
+        else:
+            u = 0.0
+
+        vx, vy, ex, ey, _, _ = self.edgeData[index]
+        newTheta = atan2(tx * ry - ty * rx, tx * rx + ty * ry)
+
+        return index, u, min(max(newTheta, 0.0), pi), vx + u * ex, vy + u * ey
+
+    def to_parameter(self, index: int, u: float):
+        return self.phiStartList[index] + u * self.phiLengthList[index]
+
+    def is_grazing(self, theta: float):
+        acc = self.acc
+        return -acc < theta < acc or pi - acc < theta < pi + acc
+
+    def billiard_map(
+        self,
+        condition: Tuple[float, float],
+        method: str = None
+    ):
+        '''Same interface as the maps built by make_billiard_map. The
+        numeric method is ignored.
+        '''
+        phi0, theta0 = condition
+        index, u = self.find_edge(phi0)
+        if self.is_grazing(theta0):
+            vx, vy, ex, ey, _, _ = self.edgeData[index]
+            return ((phi0, theta0), (vx + u * ex, vy + u * ey))
+
+        index, u, theta1, x1, y1 = self.step(index, u, theta0)
+
+        return ((self.to_parameter(index, u), theta1), (x1, y1))
+
+    def state_map(
+        self,
+        state: Tuple[float, float, float, float, float, float],
+        method: str = None
+    ):
+        '''Same interface as the maps built by make_billiard_map with
+        state=True. The numeric method is ignored.
+        '''
+        phi0, theta0 = state[0], state[1]
+        if self.is_grazing(theta0):
+            return tuple(state)
+
+        index, u = self.find_edge(phi0)
+        index, u, theta1, x1, y1 = self.step(index, u, theta0)
+
+        return (
+            self.to_parameter(index, u), theta1, x1, y1,
+            *self.tangentList[index]
+        )
+
+    def iterate_states(
+        self,
+        state: Tuple[float, float, float, float, float, float],
+        columns: ndarray,
+        start: int,
+        stop: int
+    ):
+        '''Same as billiards.core.dynamics.iterate_states with state_map,
+        in a single loop that follows the edges instead of finding them from
+        the parameter at each bounce.
+        '''
+        if start >= stop:
+            return tuple(state)
+
+        if self.is_grazing(state[1]):
+            columns[:4, start:stop] = array(state[:4])[:, None]
+            return tuple(state)
+
+        index, u = self.find_edge(state[0])
+        theta = state[1]
+
+        step = self.step
+        phiStarts = self.phiStartList
+        phiLengths = self.phiLengthList
+        for column in range(start, stop):
+            index, u, theta, x, y = step(index, u, theta)
+            phi = phiStarts[index] + u * phiLengths[index]
+            columns[0, column] = phi
+            columns[1, column] = theta
+            columns[2, column] = x
+            columns[3, column] = y
+
+        return (phi, theta, x, y, *self.tangentList[index])
+
+
+def make_polygonal_billiard(
+    boundary: ComposedPath,
+    minDistance=1e-11,
+    acc=1e-13
+):
+    '''Returns the polygonal engine for the boundary, or None if some of its
+    components is not a straight segment.
+    '''
+    lines = [detect_primitive(path) for path in boundary.componentPaths]
+    if len(lines) == 0 or \
+            not all(isinstance(line, LinePrimitive) for line in lines):
+        return None
+
+    return PolygonalBilliard(boundary, lines, minDistance, acc)
@@ -0,0 +1,157 @@
+from math import atan2, pi, sqrt
+
+from sympy import cos, degree, expand, sin, symbols
+
+from billiards.core.geometry import SimplePath
+
+
+class LinePrimitive:
+    '''Straight segment t -> origin + t * direction, t in (t0, t1).'''
+
+    def __init__(self, origin, direction, t0, t1):
+        self.origin = origin
+        self.direction = direction
+        self.t0 = t0
+        self.t1 = t1
+
+    def intersect(self, x0, y0, dx, dy, tolerance=1e-12):
+        '''Returns the hits (s, t) of the ray (x0, y0) + s * (dx, dy), with
+        s > 0, where t is the parameter of the hit on the segment.
+        '''
+        ex, ey = self.direction
+        denominator = dx * ey - dy * ex
+        if denominator == 0:
+            return []
+
+        ox = self.origin[0] - x0
+        oy = self.origin[1] - y0
+        s = (ox * ey - oy * ex) / denominator
+        t = (ox * dy - oy * dx) / denominator
+
+        margin = tolerance * (self.t1 - self.t0)
+        if s <= 0 or t < self.t0 - margin or t > self.t1 + margin:
+            return []
+
+        return [(s, min(max(t, self.t0), self.t1))]
+
+
+class EllipsePrimitive:
+    '''Elliptic arc t -> center + cos(t) * u + sin(t) * v, t in (t0, t1).
+    Circles and rotated ellipses are particular cases.
+    '''
+
+    def __init__(self, center, u, v, t0, t1):
+        self.center = center
+        self.t0 = t0
+        self.t1 = t1
+
+        # Inverse of the matrix with columns u and v, mapping the plane to
+        # the coordinates in which the arc is the unit circle
+        determinant = u[0] * v[1] - v[0] * u[1]
+        self.inverse = (
+            (v[1] / determinant, -v[0] / determinant),
+            (-u[1] / determinant, u[0] / determinant)
+        )
+
+    def to_circle(self, x, y):
+        row0, row1 = self.inverse
+        return row0[0] * x + row0[1] * y, row1[0] * x + row1[1] * y
+
+    def intersect(self, x0, y0, dx, dy, tolerance=1e-12):
+        '''Returns the hits (s, t) of the ray (x0, y0) + s * (dx, dy), with
+        s > 0, where t is the parameter of the hit on the arc.
+        '''
+        ax, ay = self.to_circle(dx, dy)
+        bx, by = self.to_circle(x0 - self.center[0], y0 - self.center[1])
+
+        # |b + s a|^2 = 1
+        qa = ax * ax + ay * ay
+        qb = 2 * (ax * bx + ay * by)
+        qc = bx * bx + by * by - 1
+        discriminant = qb * qb - 4 * qa * qc
+        if discriminant < 0:
+            return []
+
+        # Stable roots, so a ray leaving the arc itself gets an exact 0
+        q = -(qb + sqrt(discriminant)) / 2 if qb >= 0 \
+            else -(qb - sqrt(discriminant)) / 2
+        roots = [q / qa]
+        if q != 0:
+            roots.append(qc / q)
+
+        hits = []
+        margin = tolerance * (self.t1 - self.t0)
+        for s in roots:
+            if s <= 0:
+                continue
+
+            angle = atan2(by + s * ay, bx + s * ax)
+            t = self.t0 + (angle - self.t0) % (2 * pi)
+            if t > self.t1 + margin:
+                # Hits just before t0 wrap around to almost t0 + 2 * pi
+                if t - 2 * pi < self.t0 - margin:
+                    continue
+                t = self.t0
+
+            hits.append((s, min(t, self.t1)))
+
+        return hits
+
+
+def detect_primitive(path: SimplePath):
+    '''Recognizes paths that are straight segments or elliptic arcs
+    (parametrized by the angle) and returns the corresponding primitive.
+    Returns None for other paths.
+    '''
+
+    if not isinstance(path, SimplePath):
+        return None
+
+    t = symbols("t")
+    substitutions = path.parameter_substitutions()
+    expressions = [
+        path.expressionX.subs(substitutions),
+        path.expressionY.subs(substitutions)
+    ]
+    t0, t1 = path.t0Float, path.t1Float
+
+    try:
+        if all(
+            expression.is_polynomial(t) and degree(expression, t) <= 1
+            for expression in expressions
+        ):
+            origin = [float(e.subs(t, 0)) for e in expressions]
+            direction = [float(e.coeff(t, 1)) for e in expressions]
+            if direction == [0.0, 0.0]:
+                return None
+
+            return LinePrimitive(origin, direction, t0, t1)
+
+        center = []
+        u = []
+        v = []
+        for expression in expressions:
+            expanded = expand(expression, trig=True)
+            cosCoefficient = expanded.coeff(cos(t))
+            sinCoefficient = expanded.coeff(sin(t))
+            rest = expand(
+                expanded - cosCoefficient * cos(t) - sinCoefficient * sin(t)
+            )
+            if any(
+                term.has(t)
+                for term in (cosCoefficient, sinCoefficient, rest)
+            ):
+                return None
+
+            center.append(float(rest))
+            u.append(float(cosCoefficient))
+            v.append(float(sinCoefficient))
+
+        if u[0] * v[1] - v[0] * u[1] == 0:
+            return None
+
+        return EllipsePrimitive(center, u, v, t0, t1)
+
+    except (TypeError, ValueError):
+        # Expressions with free symbols other than t
+        return None
@@ -0,0 +1,491 @@
+from functools import lru_cache
+from random import uniform
+from time import perf_counter
+
+from numpy import (abs as np_abs, arange, array, asarray, ascontiguousarray,
+                   concatenate, empty_like, errstate, intp, linspace, minimum,
+                   nanmax, vander, zeros)
+from numpy.linalg import inv
+from numpy.polynomial.chebyshev import chebpts1
+from numpy.polynomial.polynomial import polyval
+
+from billiards.core.geometry import ComposedPath, SimplePath
+from billiards.core.kernels import compile_source
+from billiards.core.primitives import detect_primitive
+
+# Rows of the stacked series (x, y, dx, dy, ddx, ddy) evaluated by each
+# kernel of the pieces
+KERNEL_ROWS = {
+    "point": (0, 2),
+    "tangent": (2, 4),
+    "secondDerivative": (4, 6),
+    "frame": (0, 4),
+    "secondOrderFrame": (0, 6)
+}
+
+
+@lru_cache
+def interpolation_matrix(degree):
+    '''Returns the degree + 1 Chebyshev nodes in (-1, 1) and the matrix
+    that maps the values on the nodes to the power series of the polynomial
+    interpolating them.
+    '''
+    nodes = chebpts1(degree + 1)
+
+    return nodes, inv(vander(nodes, degree + 1, increasing=True)).T
+
+
+def horner_source(coefficients):
+    '''Source of the polynomial in u with the given coefficients, from
+    degree 0 up, in Horner's form.
+    '''
+    last = len(coefficients) - 1
+    while last > 0 and coefficients[last] == 0:
+        last -= 1
+
+    source = repr(float(coefficients[last]))
+    for coefficient in coefficients[last - 1::-1] if last > 0 else []:
+        source = f"{float(coefficient)!r} + u * ({source})"
+
+    return source
+
+
+class ChebyshevPath:
+    '''Approximation of a SimplePath by piecewise polynomials for x, y and
+    their first and second derivatives, fitted on Chebyshev nodes. The
+    domain is split until every polynomial is within tolerance of the exact
+    path on a validation grid of 4 * degree + 1 points per piece, whose
+    largest error is kept in maxError. The tolerance isn't guaranteed
+    between those points: denseError is the error measured on a denser
+    grid, independent of the fit (see dense_error).
+
+    Each piece is stored as power series in its local variable u in
+    (-1, 1). The vectorized evaluation runs Horner's method on all the
+    parameters together, taking each coefficient of their pieces from an
+    array indexed by degree, row and piece. The scalar evaluation calls a
+    function generated for each piece, so a frame costs one piece lookup
+    and one call. Whether that is faster than the exact path depends on
+    its expressions (see benchmark_surrogate).
+
+    It implements the numeric interface of SimplePath, so a ComposedPath
+    of ChebyshevPaths can be used wherever a boundary is expected. Symbolic
+    operations (evaluate=False, to_json, ...) are forwarded to the exact
+    path.
+    '''
+
+    def __init__(
+        self,
+        path: SimplePath,
+        tolerance=1e-10,
+        degree=4,
+        maxDepth=20
+    ):
+        self.initialize(path, tolerance, degree, maxDepth)
+
+        self.maxError = 0.0
+        pieces = []
+
+        pending = [(self.t0Float, self.t1Float, 0)]
+        while len(pending) > 0:
+            start, end, depth = pending.pop()
+            coefficients, error = self.fit_piece(start, end)
+
+            if error > tolerance and depth < maxDepth:
+                middle = (start + end) / 2
+                pending.append((middle, end, depth + 1))
+                pending.append((start, middle, depth + 1))
+                continue
+
+            if error > tolerance:
+                raise Exception(
+                    f"Couldn't approximate {path} within {tolerance}: " +
+                    f"error {error} on ({start}, {end})."
+                )
+
+            self.maxError = max(self.maxError, error)
+            pieces.append((start, end, depth, coefficients))
+
+        pieces.sort(key=lambda piece: piece[0])
+        self.pieceStarts = [start for start, _, _, _ in pieces]
+        self.centers = [(start + end) / 2 for start, end, _, _ in pieces]
+        self.scales = [
+            2 / (end - start) if end > start else 0.0
+            for start, end, _, _ in pieces
+        ]
+        self.coefficients = array([
+            coefficients for _, _, _, coefficients in pieces
+        ])
+
+        # The pieces are halves of halves of the domain, so each cell of
+        # the grid of the deepest pieces is in a single piece
+        depth = max(depth for _, _, depth, _ in pieces)
+        self.pieceTable = []
+        for index, (_, _, pieceDepth, _) in enumerate(pieces):
+            self.pieceTable.extend([index] * 2 ** (depth - pieceDepth))
+        self.cellsPerUnit = 2 ** depth / self.lengthFloat \
+            if self.lengthFloat > 0 else 0.0
+
+        self.initialize_arrays()
+        self.compile()
+        self.denseError = self.dense_error()
+
+    def initialize(self, path: SimplePath, tolerance, degree, maxDepth):
+        '''Sets the exact path and the fitting settings.'''
+        self.path = path
+        self.tolerance = tolerance
+        self.degree = degree
+        self.maxDepth = maxDepth
+
+        self.t0 = path.t0
+        self.t1 = path.t1
+        self.length = path.length
+        self.lengthFloat = path.lengthFloat
+        self.t0Float = path.t0Float
+        self.t1Float = path.t1Float
+        self.startpoint = path.startpoint
+        self.endpoint = path.endpoint
+        self.parameters = path.parameters
+
+    def initialize_arrays(self):
+        '''Sets the arrays used by the vectorized evaluation.'''
+        self.seriesByDegree = ascontiguousarray(
+            self.coefficients.transpose(2, 1, 0)
+        )
+        self.pieceTableArray = array(self.pieceTable, dtype=intp)
+        self.centersArray = array(self.centers)
+        self.scalesArray = array(self.scales)
+
+    def fit_piece(self, start, end):
+        '''Returns the power series, in the local variable of the piece
+        (start, end), of x, y and their derivatives, as an array of shape
+        (6, degree + 1), and their maximum error on the validation grid.
+        '''
+        center = (start + end) / 2
+        scale = 2 / (end - start) if end > start else 0.0
+
+        coefficients = zeros((6, self.degree + 1))
+        if scale == 0:
+            coefficients[:, 0] = self.exact_values(array([center]))[:, 0]
+            return coefficients, 0.0
+
+        nodes, interpolation = interpolation_matrix(self.degree)
+        validationTs = linspace(start, end, 4 * self.degree + 1)
+        values = self.exact_values(
+            concatenate([center + nodes / scale, validationTs])
+        )
+
+        coefficients = values[:, :len(nodes)] @ interpolation
+        approximated = polyval(
+            (validationTs - center) * scale, coefficients.T
+        )
+        with errstate(invalid="ignore"):
+            error = float(nanmax(np_abs(
+                approximated - values[:, len(nodes):]
+            )))
+
+        return coefficients, error
+
+    def dense_error(self):
+        '''Returns the maximum error of the vectorized evaluation on a grid
+        independent of the fit: 8 * degree points per piece, between the
+        points of its validation grid.
+        '''
+        count = 8 * self.degree
+        offsets = (2 * arange(count) + 1) / (2 * count)
+        ends = self.pieceStarts[1:] + [self.t1Float]
+        ts = concatenate([
+            start + (end - start) * offsets
+            for start, end in zip(self.pieceStarts, ends)
+        ])
+
+        with errstate(invalid="ignore"):
+            return float(nanmax(np_abs(
+                self.evaluate_series(ts, 0, 6) - self.exact_values(ts)
+            )))
+
+    def compile(self):
+        '''Generates the scalar kernels of each piece, functions of the
+        local variable u (see KERNEL_ROWS).
+        '''
+        self.kernels = {name: [] for name in KERNEL_ROWS}
+        for index, coefficients in enumerate(self.coefficients):
+            for name, (first, last) in KERNEL_ROWS.items():
+                outputs = ", ".join(
+                    horner_source(row) for row in coefficients[first:last]
+                )
+                source = f"def {name}(u):\n    return [{outputs}]\n"
+                self.kernels[name].append(
+                    compile_source(name, source, "math")
+                )
+
+    def exact_values(self, ts):
+        return concatenate([
+            self.path.get_points(ts),
+            self.path.get_tangents(ts),
+            self.path.get_second_derivatives(ts)
+        ])
+
+    def find_piece(self, s):
+        '''Returns the index of the piece containing s and the local
+        variable of s on it.
+        '''
+        s = float(s)
+        if s < self.t0Float or s > self.t1Float:
+            raise Exception(
+                f"Parameter {s} not in path's domain ({self.t0}, {self.t1})."
+            )
+
+        cell = int((s - self.t0Float) * self.cellsPerUnit)
+        index = self.pieceTable[min(cell, len(self.pieceTable) - 1)]
+
+        return index, (s - self.centers[index]) * self.scales[index]
+
+    def evaluate_kernel(self, name, s):
+        index, u = self.find_piece(s)
+
+        return self.kernels[name][index](u)
+
+    def get_point(self, s, evaluate=False):
+        if not evaluate:
+            return self.path.get_point(s)
+
+        return self.evaluate_kernel("point", s)
+
+    def get_tangent(self, s, evaluate=False):
+        if not evaluate:
+            return self.path.get_tangent(s)
+
+        return self.evaluate_kernel("tangent", s)
+
+    def get_second_derivative(self, s, evaluate=False):
+        if not evaluate:
+            return self.path.get_second_derivative(s)
+
+        return self.evaluate_kernel("secondDerivative", s)
+
+    def get_frame(self, s, evaluate=False, secondOrder=False):
+        if not evaluate:
+            return self.path.get_frame(s, secondOrder=secondOrder)
+
+        return self.evaluate_kernel(
+            "secondOrderFrame" if secondOrder else "frame", s
+        )
+
+    def evaluate_series(self, ts, first, last):
+        '''Evaluates the rows first to last of the stacked series (see
+        KERNEL_ROWS) on the array ts, all the pieces together.
+        '''
+        ts = asarray(ts, dtype=float)
+        if ((ts < self.t0Float) | (ts > self.t1Float)).any():
+            raise Exception(
+                f"Parameters not in path's domain ({self.t0}, {self.t1})."
+            )
+
+        cells = ((ts - self.t0Float) * self.cellsPerUnit).astype(intp)
+        minimum(cells, len(self.pieceTable) - 1, out=cells)
+        indexes = self.pieceTableArray.take(cells)
+        u = (ts - self.centersArray[indexes]) * self.scalesArray[indexes]
+
+        series = self.seriesByDegree
+        values = series[-1, first:last].take(indexes, axis=1)
+        terms = empty_like(values)
+        for degree in range(len(series) - 2, -1, -1):
+            series[degree, first:last].take(indexes, axis=1, out=terms)
+            values *= u
+            values += terms
+
+        return values
+
+    def get_points(self, ts):
+        return self.evaluate_series(ts, *KERNEL_ROWS["point"])
+
+    def get_tangents(self, ts):
+        return self.evaluate_series(ts, *KERNEL_ROWS["tangent"])
+
+    def get_second_derivatives(self, ts):
+        return self.evaluate_series(ts, *KERNEL_ROWS["secondDerivative"])
+
+    def get_frames(self, ts):
+        return self.evaluate_series(ts, *KERNEL_ROWS["frame"])
+
+    def poligonize(self, tolerance=1e-3):
+        '''Polyline with the vertices of the exact path's polyline (see
+        SimplePath.poligonize), evaluated on the surrogate.
+        '''
+        ts, _ = self.path.poligonize(tolerance)
+
+        return ts, self.get_points(ts)
+
+    def containing_box(self, tolerance=1e-4, padding=False):
+        return self.path.containing_box(tolerance, padding)
+
+    def with_parameters(self, values):
+        '''Fits the surrogate of the exact path with the given parameter
+        values (see SimplePath.with_parameters).
+        '''
+        return ChebyshevPath(
+            self.path.with_parameters(values),
+            self.tolerance,
+            self.degree,
+            self.maxDepth
+        )
+
+    def to_json(self):
+        return self.path.to_json()
+
+    def to_compiled(self):
+        '''Returns the exact path's compiled form (see
+        SimplePath.to_compiled) and the fitted pieces, from which
+        from_compiled rebuilds the surrogate without fitting it again.
+        '''
+        return {
+            "path": self.path.to_compiled(),
+            "tolerance": self.tolerance,
+            "degree": self.degree,
+            "maxDepth": self.maxDepth,
+            "maxError": self.maxError,
+            "denseError": self.denseError,
+            "pieceStarts": self.pieceStarts,
+            "centers": self.centers,
+            "scales": self.scales,
+            "coefficients": self.coefficients,
+            "pieceTable": self.pieceTable,
+            "cellsPerUnit": self.cellsPerUnit
+        }
+
+    def from_compiled(dictionaire):
+        surrogate = ChebyshevPath.__new__(ChebyshevPath)
+        surrogate.initialize(
+            SimplePath.from_compiled(dictionaire["path"]),
+            dictionaire["tolerance"],
+            dictionaire["degree"],
+            dictionaire["maxDepth"]
+        )
+
+        surrogate.maxError = dictionaire["maxError"]
+        surrogate.denseError = dictionaire["denseError"]
+        surrogate.pieceStarts = dictionaire["pieceStarts"]
+        surrogate.centers = dictionaire["centers"]
+        surrogate.scales = dictionaire["scales"]
+        surrogate.coefficients = dictionaire["coefficients"]
+        surrogate.pieceTable = dictionaire["pieceTable"]
+        surrogate.cellsPerUnit = dictionaire["cellsPerUnit"]
+        surrogate.initialize_arrays()
+        surrogate.compile()
+
+        return surrogate
+
+    def __str__(self):
+        return str(self.path)
+
+
+def component_from_compiled(dictionaire):
+    '''Rebuilds a boundary component, a SimplePath or a ChebyshevPath, from
+    its compiled form (see to_compiled).
+    '''
+    if "coefficients" in dictionaire:
+        return ChebyshevPath.from_compiled(dictionaire)
+
+    return SimplePath.from_compiled(dictionaire)
+
+
+def make_surrogate(
+    boundary: ComposedPath,
+    tolerance=1e-10,
+    degree=4
+) -> ComposedPath:
+    '''Returns a boundary whose components are Chebyshev approximations of
+    the given boundary's components, fitted to the given tolerance on the
+    coordinates and on their first and second derivatives (see
+    ChebyshevPath, whose denseError is the error measured after the fit).
+
+    Components that are straight segments or elliptic arcs (see
+    detect_primitive) are kept exact: they are as cheap to evaluate, and
+    the billiard map hits them by ray intersection.
+    '''
+
+    return ComposedPath([
+        component["path"] if detect_primitive(component["path"]) is not None
+        else ChebyshevPath(component["path"], tolerance, degree)
+        for component in boundary.paths
+    ], periodic=boundary.periodic)
+
+
+def benchmark_surrogate(
+    boundary: ComposedPath,
+    surrogate: ComposedPath,
+    samples=2000,
+    repeats=5
+):
+    '''Compares the surrogate with the exact boundary on random parameters.
+    Returns the max errors (on the validation grids, on the dense grids and
+    on the random parameters) and the evaluation times (the best of
+    repeats) of frames, one by one and vectorized, on both boundaries, and
+    on each approximated component alone.
+    '''
+
+    def best_time(function):
+        times = []
+        for _ in range(repeats):
+            start = perf_counter()
+            function()
+            times.append(perf_counter() - start)
+
+        return min(times)
+
+    def compare(exactCurve, surrogateCurve, t0, t1):
+        ts = [uniform(t0, t1) for _ in range(samples)]
+        tArray = array(ts)
+
+        def scalar(curve):
+            return lambda: [curve.get_frame(t, evaluate=True) for t in ts]
+
+        def vector(curve):
+            return lambda: curve.get_frames(tArray)
+
+        with errstate(invalid="ignore"):
+            error = float(nanmax(np_abs(
+                exactCurve.get_frames(tArray) -
+                surrogateCurve.get_frames(tArray)
+            )))
+
+        times = {
+            "scalarTime": best_time(scalar(exactCurve)),
+            "surrogateScalarTime": best_time(scalar(surrogateCurve)),
+            "vectorTime": best_time(vector(exactCurve)),
+            "surrogateVectorTime": best_time(vector(surrogateCurve))
+        }
+
+        return {
+            "measuredError": error,
+            **times,
+            "scalarSpeedup":
+                times["scalarTime"] / times["surrogateScalarTime"],
+            "vectorSpeedup":
+                times["vectorTime"] / times["surrogateVectorTime"]
+        }
+
+    components = []
+    for index, component in enumerate(surrogate.paths):
+        path = component["path"]
+        if isinstance(path, ChebyshevPath):
+            components.append({
+                "index": index,
+                "fitError": path.maxError,
+                "denseError": path.denseError,
+                "pieces": len(path.pieceStarts),
+                **compare(
+                    path.path, path, path.t0Float, path.t1Float
+                )
+            })
+
+    return {
+        "fitError": max(
+            [component["fitError"] for component in components] + [0.0]
+        ),
+        "denseError": max(
+            [component["denseError"] for component in components] + [0.0]
+        ),
+        **compare(boundary, surrogate, 0, boundary.lengthFloat),
+        "components": components
+    }
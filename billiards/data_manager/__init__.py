@@ -1,18 +1,21 @@
 import json
 import os
 from pathlib import Path
+from typing import Callable
 
 from pandas import read_csv
 
 from billiards.exceptions import ObjectExistsException
-from billiards.core.dynamics import Billiard, Orbit
+from billiards.core.dynamics import Billiard, Orbit, make_billiard_map
 from billiards.core.geometry import ComposedPath
+from billiards.data_manager.compiled_cache import CompiledBoundaryCache
 
 defaultValues = {
     "mainFolder": "data",
     "subfolders": {
         "simulations": "simulations",
         "boundaries": "boundaries",
+        "compiled": "compiled",
         "orbits": "orbits"
     }
 }
@@ -37,6 +40,7 @@ class DataManager:
                 Path(folderPath).mkdir(exist_ok=True, parents=True)
 
         self.folders = necessaryFolders
+        self.compiledCache = CompiledBoundaryCache(self.folders["compiled"])
 
     def boundary_exists(self, boundaryName):
         filePath = os.path.join(self.folders["boundaries"], boundaryName)
@@ -49,7 +53,7 @@ class DataManager:
         filePath = os.path.join(self.folders["boundaries"], boundaryName)
         componentArray = json.load(open(filePath))
 
-        boundary = ComposedPath.from_json(componentArray)
+        boundary = self.compiledCache.load(componentArray)
 
         return boundary
 
@@ -68,9 +72,12 @@ class DataManager:
         simulationParams = self.load_simulation(simulationName)
 
         boundary = self.load_boundary(simulationParams["boundary"])
-        orbits = self.load_simulation_orbits(simulationName, boundary)
+        stateMap = make_billiard_map(boundary, state=True)
+        orbits = self.load_simulation_orbits(
+            simulationName, boundary, stateMap
+        )
 
-        return Billiard(boundary, orbits=orbits)
+        return Billiard(boundary, orbits=orbits, stateMap=stateMap)
 
     def load_simulation_boundary(self, simulationName):
         filePath = os.path.join(self.folders["simulations"], simulationName)
@@ -83,8 +90,13 @@ class DataManager:
     def load_simulation_orbits(
         self,
         simulationName,
-        boundary: ComposedPath = None
+        boundary: ComposedPath = None,
+        stateMap: Callable = None
     ):
+        '''stateMap: The boundary's state map, if already built (see
+        make_billiard_map). Otherwise it's built once and shared by the
+        loaded orbits.
+        '''
         if boundary is None:
             boundary = self.load_simulation_boundary(simulationName)
 
@@ -94,8 +106,14 @@ class DataManager:
         if os.path.exists(orbitsFolder):
             fileList = os.listdir(orbitsFolder)
 
+        if stateMap is None:
+            stateMap = make_billiard_map(boundary, state=True)
         orbits = [
-            Orbit(boundary, read_csv(os.path.join(orbitsFolder, fileName)))
+            Orbit(
+                boundary,
+                read_csv(os.path.join(orbitsFolder, fileName)),
+                stateMap=stateMap
+            )
             for fileName in fileList
             if fileName.endswith(".csv")
         ]
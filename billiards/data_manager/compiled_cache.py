@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+from billiards.core.geometry import ComposedPath, SimplePath
+from billiards.core.kernels import KERNEL_VERSION
+
+# Bump whenever the format of the entries changes
+CACHE_VERSION = 3
+
+
+def boundary_key(componentArray):
+    '''Hash of the paths' expressions and domains, as given in the boundary
+    json. The parameter values are left out, so the members of a family of
+    boundaries share the entry.
+    '''
+    expressions = [
+        {key: value for key, value in component.items() if key != "parameters"}
+        for component in componentArray
+    ]
+    serialized = json.dumps(
+        [CACHE_VERSION, KERNEL_VERSION, expressions],
+        sort_keys=True, default=str
+    )
+
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class CompiledBoundaryCache:
+    '''Stores the parsed and derived expressions and the generated kernels
+    of each boundary, so they are built only once per boundary definition.
+    Stale or unreadable entries are rebuilt.
+    '''
+
+    def __init__(self, folder: str):
+        Path(folder).mkdir(exist_ok=True, parents=True)
+        self.folder = folder
+
+    def entry_path(self, key: str):
+        return os.path.join(self.folder, f"{key}.pickle")
+
+    def load(self, componentArray) -> ComposedPath:
+        key = boundary_key(componentArray)
+
+        boundary = self.read(key, componentArray)
+        if boundary is None:
+            boundary = ComposedPath.from_json(componentArray)
+            self.write(key, boundary)
+
+        return boundary
+
+    def read(self, key: str, componentArray):
+        entryPath = self.entry_path(key)
+        if not os.path.exists(entryPath):
+            return None
+
+        try:
+            with open(entryPath, "rb") as f:
+                entry = pickle.load(f)
+
+            if (
+                entry["version"] != CACHE_VERSION or
+                entry["key"] != key or
+                len(entry["paths"]) != len(componentArray)
+            ):
+                return None
+
+            return ComposedPath([
+                SimplePath.from_compiled(compiledPath).with_parameters(
+                    component.get("parameters", {})
+                )
+                for compiledPath, component in zip(
+                    entry["paths"], componentArray
+                )
+            ])
+        except Exception:
+            return None
+
+    def write(self, key: str, boundary: ComposedPath):
+        entry = {
+            "version": CACHE_VERSION,
+            "key": key,
+            "paths": [
+                component["path"].to_compiled()
+                for component in boundary.paths
+            ]
+        }
+
+        # Write to a temporary file first so concurrent readers never see a
+        # partial entry.
+        entryPath = self.entry_path(key)
+        temporaryPath = f"{entryPath}.{os.getpid()}.tmp"
+        with open(temporaryPath, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(temporaryPath, entryPath)
@@ -1,3 +1,31 @@
 class ObjectExistsException(BaseException):
     def __init__(self, message: str):
         super().__init__(message)
+
+
+class ConvergenceException(Exception):
+    '''Raised by the numeric methods when they don't converge within the
+    allowed iterations. The last estimate of the root is kept in estimate.
+    '''
+
+    def __init__(self, message: str, estimate=None):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class BracketException(Exception):
+    '''Raised by the numeric methods when the function has the same sign on
+    both ends of the given bracket, so it may not contain a root.
+    '''
+
+
+class UnsupportedExpressionException(Exception):
+    '''Raised when an expression uses functions that a kernel module can't
+    evaluate (see billiards.core.kernels.generate_source).
+    '''
+
+
+class NonFiniteValueException(ArithmeticError):
+    '''Raised when a path evaluates to nan or infinity, as on the
+    singularities of its expressions (see SimplePath.evaluate_function).
+    '''
@@ -1,11 +1,11 @@
-from math import ceil, log, pi
+from math import log, pi
 from typing import List
 
 from matplotlib import use as mpl_use
 from matplotlib.pyplot import close
 from matplotlib.pyplot import figure as plt_figure
 from matplotlib.pyplot import show as plt_show
-from numpy import array, concatenate, linspace
+from numpy import concatenate, insert, nan
 
 from billiards.core.dynamics import Orbit
 from billiards.core.geometry import ComposedPath
@@ -20,8 +20,11 @@ class GraphicsMatPlotLib:
         self,
         boundary: ComposedPath,
         orbits: List[Orbit] = [],
-        renderPrecision=.1
+        renderPrecision=.001
     ):
+        '''renderPrecision: Maximum distance between the drawn boundary and
+        the boundary.
+        '''
         self.boundary = boundary
         self.orbits = orbits
         self.renderPrecision = renderPrecision
@@ -46,23 +49,18 @@ class GraphicsMatPlotLib:
 
         # Get boundary
         boundaryPoints = []
-        if plotBoundary:
-            numIntervals = ceil(
-                boundary.lengthFloat / self.renderPrecision
-            )
-            if numIntervals != 0:
-                idPlotBoundary = timer.start_operation("evaluate_boundary")
+        if plotBoundary and len(boundary.paths) > 0:
+            idPlotBoundary = timer.start_operation("evaluate_boundary")
 
-                tValues = linspace(
-                    0, boundary.lengthFloat, numIntervals
-                )
+            _, (x, y), validSegments = boundary.poligonize(
+                self.renderPrecision
+            )
 
-                x, y = array([
-                    boundary.get_point(t, evaluate=True) for t in tValues
-                ]).T
-                boundaryPoints = [x, y]
+            # Break the line between components that don't connect
+            gaps = (~validSegments).nonzero()[0] + 1
+            boundaryPoints = [insert(x, gaps, nan), insert(y, gaps, nan)]
 
-                timer.end_operation("evaluate_boundary", idPlotBoundary)
+            timer.end_operation("evaluate_boundary", idPlotBoundary)
 
         # Get (orbit) points
         phasePoints = [[], []]
@@ -1,10 +1,11 @@
 
 import PySimpleGUI as sg
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from sympy import limit, parse_expr
+from sympy import limit
 
 from billiards.core.geometry import ComposedPath
 from billiards.graphics.mpl import GraphicsMatPlotLib
+from billiards.utils.misc import parse_expression
 
 
 def disturb_boundary_window(boundary: ComposedPath):
@@ -46,13 +47,13 @@ def disturb_boundary_window(boundary: ComposedPath):
 
         if event == "ok":
             limitT0 = limit(
-                parse_expr(values["function"]),
-                "t", parse_expr(values["t0"]),
+                parse_expression(values["function"]),
+                "t", parse_expression(values["t0"]),
                 "+"
             )
             limitT1 = limit(
-                parse_expr(values["function"]),
-                "t", parse_expr(values["t1"]),
+                parse_expression(values["function"]),
+                "t", parse_expression(values["t1"]),
                 "-"
             )
             if limitT0 != 0 or limitT1 != 0:
@@ -1,9 +1,8 @@
 
 import PySimpleGUI as sg
 
-from sympy import parse_expr
-
 from billiards.data_manager import DataManager
+from billiards.utils.misc import to_number
 
 dm = DataManager()
 
@@ -42,10 +41,10 @@ def get_filter_window(boundaryLength):
             thetaMaxExpr = values["thetaMax"]
 
             try:
-                tMin = float(parse_expr(tMinExpr).evalf())
-                tMax = float(parse_expr(tMaxExpr).evalf())
-                thetaMin = float(parse_expr(thetaMinExpr).evalf())
-                thetaMax = float(parse_expr(thetaMaxExpr).evalf())
+                tMin = to_number(tMinExpr)
+                tMax = to_number(tMaxExpr)
+                thetaMin = to_number(thetaMinExpr)
+                thetaMax = to_number(thetaMaxExpr)
 
                 tRange = (tMin, tMax)
                 thetaRange = (thetaMin, thetaMax)
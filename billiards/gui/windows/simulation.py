@@ -221,6 +221,7 @@ def simulation_window(simulationName: str):
         elif event in (sg.WIN_CLOSED, "close"):
             break
 
+    billiard.close_executor()
     window.close()
 
 
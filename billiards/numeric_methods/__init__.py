@@ -1,21 +1,129 @@
+from math import nan
 from typing import Callable, List
 
 import billiards.numeric_methods.methods as methods
+from billiards.exceptions import ConvergenceException
+from billiards.numeric_methods.statistics import (CountedFunction,
+                                                  SolverStatistics)
 
-METHODS = {
-    "Bissection": methods.find_zero_bissec,
-    "Newton": methods.find_zero_newton,
-    "Regula Falsi": methods.find_zero_regula_falsi,
-}
+METHODS = {}
+
+# Methods that also accept arrays of brackets
+BATCH_METHODS = []
+
+# Methods whose function also returns the second derivative
+SECOND_ORDER_METHODS = []
+
+STATISTICS = {}
 
 DEFAULT_METHOD = "Newton"
 
 
+def register_method(
+    name: str,
+    handler: Callable,
+    batch: bool = False,
+    secondOrder: bool = False
+):
+    '''Makes a numeric method available to find_zero (and so to the
+    billiard maps) under the given name.
+
+    handler: Called as handler(function, x_1, x_2, acc, max_iter). It should
+    raise ConvergenceException, with the last estimate, when it doesn't
+    converge, and BracketException when the function has the same sign on
+    x_1 and x_2.
+    batch: Whether it also accepts arrays of brackets, as
+    methods.find_zero_newton_batch.
+    secondOrder: Whether it expects the function to also return the second
+    derivative.
+    '''
+    METHODS[name] = handler
+    STATISTICS[name] = SolverStatistics()
+
+    for methodList, included in (
+        (BATCH_METHODS, batch),
+        (SECOND_ORDER_METHODS, secondOrder)
+    ):
+        if included and name not in methodList:
+            methodList.append(name)
+        elif not included and name in methodList:
+            methodList.remove(name)
+
+
+register_method("Bissection", methods.find_zero_bissec)
+register_method("Newton", methods.find_zero_newton)
+register_method("Halley", methods.find_zero_halley, secondOrder=True)
+register_method("Regula Falsi", methods.find_zero_regula_falsi)
+register_method("Brent", methods.find_zero_brent)
+register_method(
+    "Batched Newton", methods.find_zero_newton_batch, batch=True
+)
+
+
+def get_statistics(method: str = None):
+    '''Returns the statistics of the given method, or of every method, since
+    the last reset. Statistics are kept per process, and shared by its
+    threads.
+    '''
+    if method is not None:
+        return STATISTICS[method].stats()
+
+    return {
+        name: statistics.stats() for name, statistics in STATISTICS.items()
+    }
+
+
+def reset_statistics():
+    for statistics in STATISTICS.values():
+        statistics.reset()
+
+
 def find_zero(function: Callable[[float], List[float]], x_1: float,
-              x_2: float, acc=1e-12, max_iter=100, method=DEFAULT_METHOD):
+              x_2: float, acc=1e-12, max_iter=100, method=DEFAULT_METHOD,
+              strict=False, record=True):
+    '''Finds a root of the function in the bracket (x_1, x_2) with the given
+    method, recording the call in the method's statistics.
+
+    strict: Whether to raise ConvergenceException when the method doesn't
+    converge. Otherwise the last estimate is returned.
+    record: Whether to record the call. Roots found internally (e.g. by
+    SimplePath.containing_box) aren't, so the statistics only describe the
+    billiard maps and the caller's own calls.
+    '''
 
     if method not in METHODS:
         raise Exception(f"Invalid method {method}")
 
     handler = METHODS[method]
-    return handler(function, x_1, x_2, acc, max_iter)
+    if not record:
+        try:
+            return handler(function, x_1, x_2, acc, max_iter)
+        except ConvergenceException as exception:
+            if strict:
+                raise
+
+            return exception.estimate
+
+    counted = CountedFunction(function)
+    calls = len(x_1) if method in BATCH_METHODS and \
+        hasattr(x_1, "__len__") else 1
+
+    try:
+        root = handler(counted, x_1, x_2, acc, max_iter)
+    except ConvergenceException as exception:
+        STATISTICS[method].record(
+            calls, counted.evaluations, counted.bracket_width(), True
+        )
+        if strict:
+            raise
+
+        return exception.estimate
+    except Exception:
+        STATISTICS[method].record(calls, counted.evaluations, nan, True)
+        raise
+
+    STATISTICS[method].record(
+        calls, counted.evaluations, counted.bracket_width(), False
+    )
+
+    return root
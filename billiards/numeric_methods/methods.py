@@ -1,5 +1,12 @@
+from math import copysign
+from sys import float_info
 from typing import Callable, List
 
+from numpy import abs as np_abs
+from numpy import arange, asarray, errstate, ndarray, where
+
+from billiards.exceptions import BracketException, ConvergenceException
+
 
 def find_zero_newton(function: Callable[[float], List[float]], x_1: float,
                      x_2: float, acc=0.000000000001, max_iteracao=100):
@@ -9,7 +16,7 @@ def find_zero_newton(function: Callable[[float], List[float]], x_1: float,
     fl_, df_ = function(x_1)  # fl = lower, fh = higher
     fh_, df_ = function(x_2)
     if fh_ * fl_ > 0:
-        raise Exception("ERRO in find_zero_Newton: root outside range")
+        raise BracketException("ERRO in find_zero_Newton: root outside range")
     elif fh_ == 0:
         return x_2
     elif fl_ == 0:
@@ -52,7 +59,74 @@ def find_zero_newton(function: Callable[[float], List[float]], x_1: float,
             xl_ = rts
         else:
             xh_ = rts
-    return rts
+
+    raise ConvergenceException(
+        "find_zero_Newton didn't converge", estimate=rts
+    )
+
+
+def find_zero_halley(function: Callable[[float], List[float]], x_1: float,
+                     x_2: float, acc=0.000000000001, max_iteracao=100):
+    '''Halley's method, safeguarded by bisection as find_zero_newton.
+    Here function returns the tuple f(s), f'(s), f''(s).
+    '''
+    fl_, _, _ = function(x_1)
+    fh_, _, _ = function(x_2)
+    if fh_ * fl_ > 0:
+        raise BracketException("ERRO in find_zero_Halley: root outside range")
+    elif fh_ == 0:
+        return x_2
+    elif fl_ == 0:
+        return x_1
+    elif fl_ < 0:
+        xl_ = x_1
+        xh_ = x_2
+    else:
+        xh_ = x_1
+        xl_ = x_2
+
+    rts = 0.5 * (x_1 + x_2)
+    dxold = abs(x_2 - x_1)
+    dx_ = dxold
+    fff, df_, ddf_ = function(rts)
+    for _j in range(0, max_iteracao):
+        denominator = 2.0 * df_ * df_ - fff * ddf_
+        if denominator != 0:
+            step = 2.0 * fff * df_ / denominator
+        else:
+            step = None
+
+        if (
+            step is None or
+            (rts - step - xh_) * (rts - step - xl_) > 0.0 or
+            abs(2.0 * step) > abs(dxold)
+        ):
+            # Bisect if Halley out of range, or not decreasing fast enough.
+            dxold = dx_
+            dx_ = 0.5 * (xh_ - xl_)
+            rts = xl_ + dx_
+            if xl_ == rts:
+                return rts
+        else:
+            dxold = dx_
+            dx_ = step
+            temp = rts
+            rts -= dx_
+            if temp == rts:
+                return rts
+
+        if abs(dx_) < acc:
+            return rts
+        fff, df_, ddf_ = function(rts)
+
+        if fff < 0.0:
+            xl_ = rts
+        else:
+            xh_ = rts
+
+    raise ConvergenceException(
+        "find_zero_Halley didn't converge", estimate=rts
+    )
 
 
 def find_zero_regula_falsi(function: Callable[[float], List[float]],
@@ -64,7 +138,9 @@ def find_zero_regula_falsi(function: Callable[[float], List[float]],
     f_h, d_l = function(x_2)
 
     if f_h * f_l > 0:
-        raise Exception("ERRO in find_zero_RegulaFalsi: root outside range")
+        raise BracketException(
+            "ERRO in find_zero_RegulaFalsi: root outside range"
+        )
     elif f_h == 0:
         return x_2
     elif f_l == 0:
@@ -96,7 +172,9 @@ def find_zero_regula_falsi(function: Callable[[float], List[float]],
         if ((abs(dif) < acc) or (fff == 0.0)):
             return rtf
 
-    return 0.0
+    raise ConvergenceException(
+        "find_zero_RegulaFalsi didn't converge", estimate=rtf
+    )
 
 
 def find_zero_bissec(function: Callable[[float], List[float]], x_1: float,
@@ -106,7 +184,7 @@ def find_zero_bissec(function: Callable[[float], List[float]], x_1: float,
     f_h, d_h = function(x_2)
 
     if f_h * f_l > 0:
-        raise Exception("ERRO in find_zero_Bissec: root outside range")
+        raise BracketException("ERRO in find_zero_Bissec: root outside range")
     elif f_h == 0:
         return x_2
     elif f_l == 0:
@@ -132,4 +210,150 @@ def find_zero_bissec(function: Callable[[float], List[float]], x_1: float,
             else:
                 x_h = rts
 
-    return rts
+    raise ConvergenceException(
+        "find_zero_Bissec didn't converge", estimate=(x_l + x_h) / 2
+    )
+
+
+def find_zero_brent(function: Callable[[float], List[float]], x_1: float,
+                    x_2: float, acc=0.000000000001, max_iteracao=100):
+    '''Brent's method: inverse quadratic interpolation and secant steps,
+    falling back to bisection. Only f(s) is used from the function.
+    '''
+    a, b = x_1, x_2
+    fa = function(a)[0]
+    fb = function(b)[0]
+    if fa * fb > 0:
+        raise BracketException("ERRO in find_zero_Brent: root outside range")
+    elif fb == 0:
+        return b
+    elif fa == 0:
+        return a
+
+    c, fc = b, fb
+    for _j in range(max_iteracao):
+        if (fb > 0 and fc > 0) or (fb < 0 and fc < 0):
+            # Keep the root between b and c
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        tol = 2.0 * float_info.epsilon * abs(b) + 0.5 * acc
+        xm = 0.5 * (c - b)
+        if abs(xm) <= tol or fb == 0:
+            return b
+
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # Attempt inverse quadratic interpolation (secant if a == c)
+            s = fb / fa
+            if a == c:
+                p = 2.0 * xm * s
+                q = 1.0 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2.0 * xm * q * (q - r) - (b - a) * (r - 1.0))
+                q = (q - 1.0) * (r - 1.0) * (s - 1.0)
+            if p > 0:
+                q = -q
+            p = abs(p)
+
+            if 2.0 * p < min(3.0 * xm * q - abs(tol * q), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = e = xm
+        else:
+            d = e = xm
+
+        a, fa = b, fb
+        b += d if abs(d) > tol else copysign(tol, xm)
+        fb = function(b)[0]
+
+    raise ConvergenceException(
+        "find_zero_Brent didn't converge", estimate=b
+    )
+
+
+def find_zero_newton_batch(function: Callable[..., List[ndarray]],
+                           x_1: ndarray, x_2: ndarray, acc=0.000000000001,
+                           max_iteracao=100):
+    '''Newton's method safeguarded by bisection, as find_zero_newton, run
+    in lock-step on arrays of brackets. Lanes that converge are retired, so
+    each iteration only evaluates the remaining ones.
+
+    Here function(x, lanes) returns the tuple of arrays f(x), f'(x), where
+    lanes are the indexes (in x_1 and x_2) of the entries of x.
+
+    Scalar brackets are delegated to find_zero_newton.
+    '''
+    if not isinstance(x_1, ndarray):
+        return find_zero_newton(function, x_1, x_2, acc, max_iteracao)
+
+    x_1 = asarray(x_1, dtype=float)
+    x_2 = asarray(x_2, dtype=float)
+    lanes = arange(len(x_1))
+
+    fl_, _ = function(x_1, lanes)
+    fh_, _ = function(x_2, lanes)
+    if (fh_ * fl_ > 0).any():
+        raise BracketException(
+            "ERRO in find_zero_newton_batch: root outside range"
+        )
+
+    roots = 0.5 * (x_1 + x_2)
+    roots = where(fl_ == 0, x_1, where(fh_ == 0, x_2, roots))
+
+    xl_ = where(fl_ < 0, x_1, x_2)
+    xh_ = where(fl_ < 0, x_2, x_1)
+    dxold = np_abs(x_2 - x_1)
+    dx_ = dxold.copy()
+
+    active = (fl_ != 0) & (fh_ != 0)
+    lanes = lanes[active]
+    xl_, xh_, dxold, dx_ = xl_[active], xh_[active], dxold[active], dx_[active]
+    rts = roots[lanes]
+
+    with errstate(divide="ignore", invalid="ignore"):
+        fff, df_ = function(rts, lanes)
+        for _j in range(0, max_iteracao):
+            if len(lanes) == 0:
+                break
+
+            # Bisect if Newton out of range, or not decreasing fast enough.
+            bisect = (
+                (((rts - xh_) * df_ - fff) * ((rts - xl_) * df_ - fff) > 0.0) |
+                (np_abs(2.0 * fff) > np_abs(dxold * df_))
+            )
+            dxold = dx_
+            dx_ = where(bisect, 0.5 * (xh_ - xl_), fff / df_)
+            newRts = where(bisect, xl_ + dx_, rts - dx_)
+
+            # Change in root is negligible or convergence criterion.
+            converged = (
+                where(bisect, xl_ == newRts, rts == newRts) |
+                (np_abs(dx_) < acc)
+            )
+            rts = newRts
+            roots[lanes] = rts
+
+            remaining = ~converged
+            lanes = lanes[remaining]
+            rts, xl_, xh_ = rts[remaining], xl_[remaining], xh_[remaining]
+            dx_, dxold = dx_[remaining], dxold[remaining]
+            if len(lanes) == 0:
+                break
+
+            fff, df_ = function(rts, lanes)
+            xl_ = where(fff < 0.0, rts, xl_)
+            xh_ = where(fff < 0.0, xh_, rts)
+
+    if len(lanes) > 0:
+        raise ConvergenceException(
+            f"find_zero_newton_batch didn't converge on {len(lanes)} lanes",
+            estimate=roots
+        )
+
+    return roots
@@ -0,0 +1,88 @@
+from math import nan
+from threading import Lock
+
+from numpy import ndarray
+
+
+class CountedFunction:
+    '''Wraps the function given to a numeric method, counting its
+    evaluations and keeping the last points where it was negative and
+    positive, which bracket the root.
+    '''
+
+    def __init__(self, function):
+        self.function = function
+        self.evaluations = 0
+        self.negative = None
+        self.positive = None
+
+    def __call__(self, x, *args):
+        values = self.function(x, *args)
+
+        if isinstance(x, ndarray):
+            # Batched methods: count the lanes, don't track the brackets
+            self.evaluations += len(x)
+            return values
+
+        self.evaluations += 1
+        if values[0] < 0:
+            self.negative = x
+        elif values[0] > 0:
+            self.positive = x
+        else:
+            self.negative = self.positive = x
+
+        return values
+
+    def bracket_width(self):
+        if self.negative is None or self.positive is None:
+            return nan
+
+        return abs(self.positive - self.negative)
+
+
+class SolverStatistics:
+    '''Counters of the calls to a numeric method. They are updated under a
+    lock, as the methods may run on several threads (see
+    billiards.core.dynamics.iterate_threaded).
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.evaluations = 0
+            self.failures = 0
+            self.bracketWidths = 0.0
+            self.bracketCount = 0
+            self.maxBracketWidth = 0.0
+
+    def record(self, calls, evaluations, bracketWidth, failed):
+        with self.lock:
+            self.calls += calls
+            self.evaluations += evaluations
+            if failed:
+                self.failures += calls
+
+            # nan (untracked) widths are skipped
+            if bracketWidth == bracketWidth:
+                self.bracketWidths += bracketWidth
+                self.bracketCount += 1
+                self.maxBracketWidth = max(
+                    self.maxBracketWidth, bracketWidth
+                )
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "evaluations": self.evaluations,
+                "meanEvaluations": self.evaluations / max(self.calls, 1),
+                "failures": self.failures,
+                "meanBracketWidth":
+                    self.bracketWidths / max(self.bracketCount, 1),
+                "maxBracketWidth": self.maxBracketWidth
+            }
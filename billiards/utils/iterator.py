@@ -1,9 +1,9 @@
 
-from multiprocess import Manager, Process
 from progress.bar import Bar
-from PySimpleGUI import ProgressBar, Window, Text
+from PySimpleGUI import ProgressBar, Window
 
 from billiards.core.dynamics import Billiard
+from billiards.numeric_methods import BATCH_METHODS
 
 
 def iterate_serial(
@@ -34,11 +34,28 @@ def iterate_serial(
         else:
             bar.next()
 
-    billiard.iterate(
-        iterations=iterations,
-        callback=cb,
-        method=method
-    )
+    # Batched methods advance all the orbits together. Otherwise, without
+    # the GUI, each orbit is iterated in a single loop and the progress is
+    # reported by chunks.
+    if method in BATCH_METHODS:
+        billiard.iterate_vectorized(
+            iterations=iterations,
+            callback=cb,
+            method=method
+        )
+    elif GUI:
+        billiard.iterate(
+            iterations=iterations,
+            callback=cb,
+            method=method
+        )
+    else:
+        billiard.iterate(
+            iterations=iterations,
+            callback=bar.next,
+            method=method,
+            batch=True
+        )
 
     if GUI:
         window.close()
@@ -51,74 +68,56 @@ def iterate_parallel(
     iterations: int,
     threads: int,
     GUI: bool = False,
-    method: str = None
+    method: str = None,
+    executor: str = "processes"
 ):
-    manager = Manager()
-    queue = manager.Queue()
-
-    def cb():
-        queue.put(1)
-
-    # TODO: Fix parallel bar problem
-    def tick(queue, totalIter):
-        currentProgress = 0
-        #     window = Window(
-        #         "Iterating...",
-        #         layout=[
-        #             [ProgressBar(totalIter, size=(50, 10), key="progress")]
-        #         ],
-        #         finalize=True
-        #     )
-
-        bar = Bar(
-            'Iterating', suffix='%(percent)d%% - %(eta)ds',
-            max=totalIter
-        )
-        
-
-        while True:
-            queue.get()
-            currentProgress += 1
-            # if GUI:
-            #     window["progress"].update(currentProgress)
-            bar.next()
-
-            if totalIter <= currentProgress:
-                break
-
-        bar.finish()
-
+    '''executor: "processes" runs the orbits on a pool of processes,
+    "threads" runs the batched map on a pool of threads (see
+    Billiard.iterate_threaded).
+    '''
     totalIter = iterations * len(billiard.orbits)
+    if totalIter == 0:
+        return
 
+    # The workers count their iterations in batches and the progress is
+    # reported here, on this thread (see SimulationExecutor.iterate)
     if GUI:
         window = Window(
             "Iterating...",
-            layout=[
-                [Text("Check terminal for progress."),]
-            ],
+            layout=[[ProgressBar(totalIter, size=(50, 10), key="progress")]],
             finalize=True
         )
-        # window = Window(
-        #     "Iterating...",
-        #     layout=[
-        #         [ProgressBar(totalIter, size=(50, 10), key="progress")]
-        #     ],
-        #     finalize=True
-        # )
+    else:
+        bar = Bar(
+            'Iterating', suffix='%(percent)d%% - %(eta)ds',
+            max=totalIter
+        )
 
-    consumer = Process(
-        target=tick, args=[queue, totalIter]
-    )
-    consumer.start()
+    currentProgress = [0]
 
-    billiard.iterate_parallel(
-        iterations=iterations,
-        callback=cb,
-        poolSize=threads,
-        method=method
-    )
+    def cb(count):
+        if GUI:
+            currentProgress[0] += count
+            window["progress"].update(currentProgress[0])
+        else:
+            bar.next(count)
+
+    if executor == "threads":
+        billiard.iterate_threaded(
+            iterations=iterations,
+            callback=cb,
+            threads=threads,
+            method=method
+        )
+    else:
+        billiard.iterate_parallel(
+            iterations=iterations,
+            callback=cb,
+            poolSize=threads,
+            method=method
+        )
 
-    # Bugs when there are no orbits!
-    consumer.join()
     if GUI:
         window.close()
+    else:
+        bar.finish()
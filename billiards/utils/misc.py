@@ -1,8 +1,11 @@
+from functools import lru_cache
 from numbers import Number
 from random import uniform
 
 from sympy import parse_expr
 
+PARSE_CACHE_SIZE = 1024
+
 
 def flat_array(array):
     flatenedArray = []
@@ -13,13 +16,25 @@ def flat_array(array):
     return flatenedArray
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_expression(value: str):
+    '''Memoized parse_expr. SymPy expressions are immutable, so the same
+    parsed expression can be shared by every caller.
+    '''
+    return parse_expr(value)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_number(value: str):
+    return float(parse_expression(value).evalf())
+
+
 def to_number(value):
     parsedValue = None
     if isinstance(value, Number):
         parsedValue = .0 + value
     elif isinstance(value, str):
-        expression = parse_expr(value)
-        parsedValue = float(expression.evalf())
+        parsedValue = parse_number(value)
     else:
         raise Exception(
             "value must be a mathematical expression (string) or a number." +
@@ -32,9 +47,9 @@ def to_number(value):
 def to_expr(value):
     expression = None
     if isinstance(value, Number):
-        expression = parse_expr("0.0") + value
+        expression = parse_expression("0.0") + value
     elif isinstance(value, str):
-        expression = parse_expr(value)
+        expression = parse_expression(value)
     else:
         raise Exception(
             "value must be a mathematical expression (string) or a number." +
@@ -1,7 +1,7 @@
 
 import statistics
-from time import time
-from uuid import uuid4
+from threading import Lock
+from time import perf_counter
 
 
 class OperationTimer:
@@ -11,9 +11,13 @@ class OperationTimer:
         self.measuredTimes = []
         self.totalTime = 0
 
+        # Ids only need to be unique per operation
+        self.lastId = 0
+
     def start_timer(self, verbose=False):
-        id = uuid4()
-        self.startedTimers[id] = time()
+        self.lastId += 1
+        id = self.lastId
+        self.startedTimers[id] = perf_counter()
 
         if verbose:
             print("started", self.name, id, self.startedTimers[id])
@@ -21,7 +25,7 @@ class OperationTimer:
         return id
 
     def end_timer(self, id, verbose=False):
-        end = time()
+        end = perf_counter()
         start = self.startedTimers[id]
         del self.startedTimers[id]
 
@@ -52,26 +56,35 @@ class OperationTimer:
 class Timer:
     '''TODO: Edit class so you don't have to pass the operation name
     to end the timer
+
+    The operations may be timed from several threads, so the timers are
+    updated under a lock.
     '''
 
     def __init__(self):
         self.timers = {}
+        self.lock = Lock()
 
     def start_operation(self, name):
-        if self.timers.get(name) is None:
-            self.timers[name] = OperationTimer(name)
+        with self.lock:
+            if self.timers.get(name) is None:
+                self.timers[name] = OperationTimer(name)
 
-        id = self.timers[name].start_timer()
+            id = self.timers[name].start_timer()
 
         return id
 
     def end_operation(self, name, id, verbose=False):
-        self.timers[name].end_timer(id, verbose)
+        with self.lock:
+            self.timers[name].end_timer(id, verbose)
 
     def stats(self):
         allStats = []
-        for key in self.timers:
-            allStats.append({"name": key, "stats": self.timers[key].stats()})
+        with self.lock:
+            for key in self.timers:
+                allStats.append(
+                    {"name": key, "stats": self.timers[key].stats()}
+                )
 
         return allStats
 
@@ -0,0 +1,47 @@
+import json
+import sys
+from math import pi
+from random import uniform
+from time import perf_counter
+
+from billiards.core.dynamics import make_billiard_map
+from billiards.core.geometry import ComposedPath
+from billiards.core.surrogate import benchmark_surrogate, make_surrogate
+
+# Routine to compare a boundary with its Chebyshev surrogate: the errors,
+# the evaluation times and the time per bounce of the billiard map
+
+BOUNCES = 2000
+
+# Read args
+params = json.load(open(sys.argv[1]))
+tolerance = 1e-10
+if len(sys.argv) >= 3:
+    tolerance = float(sys.argv[2])
+
+boundary = ComposedPath.from_json(params["boundary"]["paths"])
+surrogate = make_surrogate(boundary, tolerance)
+
+results = benchmark_surrogate(boundary, surrogate)
+for key, value in results.items():
+    if key != "components":
+        print(f"{key}: {value}")
+
+for component in results["components"]:
+    print(f"component {component['index']}:")
+    for key, value in component.items():
+        if key != "index":
+            print(f"  {key}: {value}")
+
+conditions = [
+    (uniform(0, boundary.lengthFloat), uniform(0.05, pi - 0.05))
+    for _ in range(BOUNCES)
+]
+for name, curve in (("exact", boundary), ("surrogate", surrogate)):
+    billiardMap = make_billiard_map(curve)
+    start = perf_counter()
+    for condition in conditions:
+        billiardMap(condition, params.get("method", "Newton"))
+    elapsed = perf_counter() - start
+
+    print(f"{name} map time/bounce: {1e6 * elapsed / BOUNCES:.1f} us")
@@ -0,0 +1,64 @@
+import json
+import sys
+from random import seed, uniform
+from time import time
+
+from billiards.core.dynamics import get_objective_function
+from billiards.core.geometry import ComposedPath
+from billiards.numeric_methods import (SECOND_ORDER_METHODS, find_zero,
+                                       get_statistics, reset_statistics)
+
+# Routine to compare the numeric methods on the boundaries of the given
+# simulation files. Each method solves the same collisions, on the full
+# period bracket, and the methods' statistics are reported.
+
+METHODS = ["Halley", "Newton", "Brent", "Regula Falsi", "Bissection"]
+SAMPLES = 200
+FACTOR = 100
+ACC = 1e-13
+
+seed(0)
+for fileName in sys.argv[1:]:
+    params = json.load(open(fileName))
+    boundary = ComposedPath.from_json(params["boundary"]["paths"])
+    period = boundary.lengthFloat
+    conditions = [
+        (uniform(0, period), uniform(0.01, 3.13)) for _ in range(SAMPLES)
+    ]
+
+    print(params["boundary"]["name"])
+    references = None
+    reset_statistics()
+    for method in METHODS:
+        roots = []
+        start = time()
+        for phi0, theta0 in conditions:
+            objective = get_objective_function(
+                boundary, phi0, theta0, method in SECOND_ORDER_METHODS
+            )
+            roots.append(find_zero(
+                objective,
+                phi0 + FACTOR * ACC,
+                phi0 + period - FACTOR * ACC,
+                acc=ACC,
+                max_iter=100,
+                method=method
+            ) % period)
+        elapsed = time() - start
+        statistics = get_statistics(method)
+
+        if references is None:
+            references = roots
+        errors = [
+            min(abs(root - reference), period - abs(root - reference))
+            for root, reference in zip(roots, references)
+        ]
+
+        print(
+            f"  {method:<13}"
+            + f" evaluations/bounce: {statistics['meanEvaluations']:6.2f}"
+            + f"  failures: {statistics['failures']:3d}"
+            + f"  mean bracket: {statistics['meanBracketWidth']:.1e}"
+            + f"  time/bounce: {1e6 * elapsed / SAMPLES:8.1f} us"
+            + f"  max deviation from {METHODS[0]}: {max(errors):.1e}"
+        )
@@ -0,0 +1,30 @@
+import json
+import sys
+
+from billiards.core.geometry import ComposedPath
+from billiards.core.kernels import operation_counts
+
+# Routine to report, for each component of the boundaries of the given
+# simulation files, the number of operations of the compiled kernels before
+# and after common subexpression elimination.
+
+for fileName in sys.argv[1:]:
+    params = json.load(open(fileName))
+    boundary = ComposedPath.from_json(params["boundary"]["paths"])
+
+    print(params["boundary"]["name"])
+    for index, path in enumerate(boundary.componentPaths):
+        point = [path.expressionX, path.expressionY]
+        tangent = [path.expressionDx, path.expressionDy]
+        secondDerivative = [path.expressionDdx, path.expressionDdy]
+        kernels = {
+            "frame": point + tangent,
+            "secondOrderFrame": point + tangent + secondDerivative
+        }
+
+        for name, expressions in kernels.items():
+            counts = operation_counts(expressions)
+            print(
+                f"  component {index} {name:<16}"
+                + f" operations: {counts['before']:4d} -> {counts['after']:4d}"
+            )
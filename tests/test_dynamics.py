@@ -0,0 +1,27 @@
+from math import cos, pi, sin
+
+import pytest
+
+from billiards.core.dynamics import make_collision_finder
+from billiards.core.geometry import ComposedPath, SimplePath
+
+
+@pytest.mark.parametrize("phi0, theta0", [
+    (1.0, pi - 1e-6), (2.324, 1e-6), (3.932, 1e-6)
+])
+def test_collision_of_nearly_tangent_rays(phi0, theta0):
+    # The polyline brackets around phi0 don't bracket a root on these rays,
+    # so the whole period is searched
+    boundary = ComposedPath([SimplePath(
+        "0", "2*pi",
+        "(1+0.3*cos(5*t))*cos(t)", "(1+0.3*cos(5*t))*sin(t)"
+    )])
+    find_collision = make_collision_finder(boundary, 100, 1e-13, 100)
+
+    phi1 = find_collision(phi0, theta0, "Newton")
+
+    x0, y0, dx0, dy0 = boundary.get_frame(phi0, evaluate=True)
+    x1, y1 = boundary.get_point(phi1 % (2 * pi), evaluate=True)
+    d_x = dx0 * cos(theta0) - dy0 * sin(theta0)
+    d_y = dy0 * cos(theta0) + dx0 * sin(theta0)
+    assert (x1 - x0) * d_y - (y1 - y0) * d_x == pytest.approx(0, abs=1e-9)
@@ -0,0 +1,53 @@
+import json
+from math import cos, isfinite, pi, sin
+
+import pytest
+
+from billiards.core.dynamics import make_billiard_map
+from billiards.core.geometry import ComposedPath, SimplePath
+
+
+@pytest.mark.parametrize("scale", ["1e-3", "1", "1e3", "1e5"])
+def test_containing_box_of_scaled_boundaries(scale):
+    # r = R(1 + 0.1 cos 3t) has degenerate extrema of its coordinates
+    boundary = ComposedPath([SimplePath(
+        "0", "2*pi",
+        f"{scale}*(1+0.1*cos(3*t))*cos(t)",
+        f"{scale}*(1+0.1*cos(3*t))*sin(t)"
+    )])
+    R = float(scale)
+
+    box = boundary.containing_box(tolerance=1e-9 * R, padding=False)
+
+    assert box[0] == pytest.approx(-0.9 * R, rel=1e-9)
+    assert box[2] == pytest.approx(1.1 * R, rel=1e-9)
+    assert box[3] == pytest.approx(-box[1], rel=1e-9)
+
+    billiardMap = make_billiard_map(boundary)
+    (phi, theta), _ = billiardMap((0.3, 1.0), "Newton")
+    assert 0 <= phi < boundary.lengthFloat
+    assert 0 <= theta <= 3.15
+
+
+def test_frame_on_bump_breakpoint():
+    # The bump component's derivatives are nan on its endpoints
+    with open("samples/deformedEllipsis.json") as f:
+        paths = json.load(f)["boundary"]["paths"]
+    boundary = ComposedPath.from_json(paths)
+    s = 1 + pi / 2
+
+    frame = boundary.get_frame(s, evaluate=True)
+    assert frame[2:] == pytest.approx([-3 * cos(1), -2 * sin(1)])
+    assert boundary.get_frames([s])[:, 0] == pytest.approx(frame)
+
+    billiardMap = make_billiard_map(boundary)
+    (phi, theta), _ = billiardMap((s, pi / 2), "Newton")
+    assert isfinite(phi) and isfinite(theta)
+
+
+@pytest.mark.parametrize("x", ["sign(t-0.5)", "sign(cos(t))"])
+def test_paths_with_unprintable_derivatives(x):
+    # The printers raise ValueError on the derivatives of sign
+    path = SimplePath("0.1", "0.9", x, "t")
+
+    assert path.get_point(0.3, evaluate=True)[1] == pytest.approx(0.3)
@@ -0,0 +1,36 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from billiards.core.geometry import ComposedPath, SimplePath
+from billiards.numeric_methods import (find_zero, get_statistics,
+                                       reset_statistics)
+
+
+def test_statistics_from_several_threads():
+    reset_statistics()
+    # Switch threads often, to interleave the updates of the counters
+    switchInterval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def solve(_):
+        for _ in range(500):
+            find_zero(lambda x: (x - 0.3, 1.0), 0, 1, method="Brent")
+
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(solve, range(8)))
+    finally:
+        sys.setswitchinterval(switchInterval)
+
+    assert get_statistics("Brent")["calls"] == 8 * 500
+
+
+def test_internal_roots_are_not_recorded():
+    reset_statistics()
+
+    path = SimplePath("0", "2*pi", "(1+0.1*cos(3*t))*cos(t)", "sin(t)")
+    ComposedPath([path]).containing_box()
+
+    assert all(
+        statistics["calls"] == 0 for statistics in get_statistics().values()
+    )
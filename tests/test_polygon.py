@@ -0,0 +1,36 @@
+from math import atan2, pi
+
+import pytest
+
+from billiards.core.geometry import ComposedPath
+from billiards.core.polygon import make_polygonal_billiard
+
+L_SHAPE = [(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)]
+
+
+def make_polygon(vertices):
+    return ComposedPath.from_json([
+        {
+            "x": f"{x0} + ({x1} - ({x0}))*t",
+            "y": f"{y0} + ({y1} - ({y0}))*t",
+            "t0": 0,
+            "t1": 1
+        }
+        for (x0, y0), (x1, y1) in zip(vertices, vertices[1:] + vertices[:1])
+    ])
+
+
+@pytest.mark.parametrize("x0", [0.2, 0.5, 0.9, 1.5, 1.9])
+def test_reflex_vertex_hits(x0):
+    # Rays from the bottom edge aimed at the reflex vertex (1, 1)
+    polygon = make_polygonal_billiard(make_polygon(L_SHAPE), 1e-11, 1e-13)
+    state = (x0 / 2, atan2(1, 1 - x0), x0, 0.0, 1.0, 0.0)
+
+    for _ in range(20):
+        state = polygon.state_map(state)
+        phi, theta, x, y, _, _ = state
+
+        assert 0 <= theta <= pi
+        index, u = polygon.find_edge(phi)
+        vx, vy, ex, ey, _, _ = polygon.edgeData[index]
+        assert (x, y) == pytest.approx((vx + u * ex, vy + u * ey))